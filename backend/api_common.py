@@ -0,0 +1,207 @@
+# api_common.py
+"""Request parsing and paging helpers shared by app.py (Flask) and app_async.py (Quart)."""
+import base64
+from datetime import datetime, timedelta, timezone
+
+import config
+
+def parse_actions(s: str | None):
+    if not s:
+        return ["BUY", "SELL", "NEUTRAL"]
+    vals = [v.strip().upper() for v in s.split(",") if v.strip()]
+    return [v for v in vals if v in ("BUY", "SELL", "NEUTRAL")] or ["BUY", "SELL", "NEUTRAL"]
+
+def parse_since(s: str | None):
+    if not s:  # default 7d
+        return "7 days"
+    s = s.strip().lower()
+    if s.endswith("h"):
+        return f"{int(s[:-1])} hours"
+    if s.endswith("d"):
+        return f"{int(s[:-1])} days"
+    if s.endswith("m"):
+        return f"{int(s[:-1])} minutes"
+    return "7 days"
+
+def parse_flag(s: str | None) -> bool:
+    return (s or "").strip().lower() in ("1", "true", "yes", "on")
+
+def parse_tickers(s: str | None, max_n: int = 1000):
+    if not s:
+        return []
+    seen, out = set(), []
+    for t in s.split(","):
+        t = t.strip()
+        if t and t not in seen:
+            seen.add(t)
+            out.append(t)
+    return out[:max_n]
+
+def range_start(range_param: str):
+    now = datetime.now(timezone.utc)
+    return {
+        "24h": now - timedelta(days=1),
+        "7d":  now - timedelta(days=7),
+        "30d": now - timedelta(days=30),
+        "90d": now - timedelta(days=90),
+        "All": None
+    }.get(range_param, None)
+
+def decimate(data: list, range_param: str):
+    # lightweight decimation for long ranges
+    if range_param in {"30d", "90d", "All"} and len(data) > 100:
+        step = 4 if range_param == "30d" else 6
+        return data[::step]
+    return data
+
+# --- keyset pagination on (timestamp, id) ---
+SIGNALS_PAGE_MAX = 500
+
+def encode_cursor(ts, row_id) -> str:
+    raw = f"{ts.isoformat()}|{int(row_id)}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(s: str | None):
+    """(timestamp, id) or (None, None) for the first page; ValueError if malformed."""
+    if not s:
+        return None, None
+    raw = base64.urlsafe_b64decode(s + "=" * (-len(s) % 4)).decode()
+    ts, row_id = raw.split("|", 1)
+    return datetime.fromisoformat(ts), int(row_id)
+
+def page_rows(rows: list, limit: int):
+    """Trim the limit+1 probe row; returns (rows, next_cursor or None). Rows need 'timestamp' and 'id'."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+
+# --- SQL shared by app.py and app_async.py ---
+# Builders take `ph(n)` rendering the n-th (1-based) placeholder and return (sql, args).
+# Optional predicates are left out of the text rather than written as "$n IS NULL OR ...",
+# so asyncpg's prepared (possibly generic) plans still get them as index conditions.
+def PH_PSYCOPG(n: int) -> str:
+    return "%s"
+
+def PH_ASYNCPG(n: int) -> str:
+    return f"${n}"
+
+class _Params:
+    def __init__(self, ph):
+        self.ph = ph
+        self.args: list = []
+
+    def __call__(self, value, cast: str = "") -> str:
+        self.args.append(value)
+        return self.ph(len(self.args)) + cast
+
+def _hourly_only(p: _Params, col: str = "strategy") -> str:
+    """Predicate skipping streamed intraday rows (strategy tagged with config.INTRADAY_TAG)."""
+    return f"position({p(config.INTRADAY_TAG, '::text')} in COALESCE({col}, '')) = 0"
+
+def prices_query(ph, tickers: list, start=None):
+    """Price history for one or more tickers, oldest first, grouped by ticker."""
+    p = _Params(ph)
+    where = f"ticker = ANY({p(tickers, '::text[]')})"
+    if start is not None:
+        where += f" AND timestamp >= {p(start, '::timestamptz')}"
+    return f"""
+        SELECT ticker, timestamp, price
+        FROM prices
+        WHERE {where}
+        ORDER BY ticker, timestamp ASC
+    """, p.args
+
+def signals_page_query(ph, *, actions: list, since: str, cursor: tuple, limit: int,
+                       ticker: str | None = None, intraday: bool = False):
+    """
+    One keyset page (limit+1 probe row) of signals, newest first; `ticker` narrows to
+    one symbol, `intraday` also returns streamed non-hourly rows.
+    """
+    p = _Params(ph)
+    where = []
+    if ticker is not None:
+        where.append(f"ticker = {p(ticker)}")
+    where.append(f"action = ANY({p(actions, '::text[]')})")
+    where.append(f"timestamp >= NOW() - {p(since, '::text')}::interval")
+    if not intraday:
+        where.append(_hourly_only(p))
+    cur_ts, cur_id = cursor
+    if cur_ts is not None:
+        # row-value comparison matches the (…, timestamp DESC, id DESC) indexes, so depth is free
+        where.append(f"(timestamp, id) < ({p(cur_ts, '::timestamptz')}, {p(cur_id, '::int')})")
+    cols = "id, timestamp, signal_type" if ticker is not None else "id, timestamp, ticker, signal_type"
+    return f"""
+        SELECT {cols}, action, signal_value, strength, message
+        FROM signals
+        WHERE {' AND '.join(where)}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT {p(limit + 1)}
+    """, p.args
+
+def latest_signals_query(ph, *, tickers: list, since: str):
+    """
+    Newest row per (ticker, signal_type) in the window. Postgres has no skip scan, so
+    DISTINCT ON would read every row in the window; instead walk
+    idx_signals_ticker_type_ts as a loose index scan (one probe per distinct pair),
+    then take the newest in-window row for each pair.
+    """
+    p = _Params(ph)
+    if tickers:
+        pairs = f"""
+            SELECT f.ticker, f.signal_type
+            FROM unnest({p(tickers, '::text[]')}) AS t(ticker)
+            CROSS JOIN LATERAL (
+                SELECT ticker, signal_type FROM signals s
+                WHERE s.ticker = t.ticker
+                ORDER BY signal_type LIMIT 1
+            ) f
+            UNION ALL
+            SELECT n.ticker, n.signal_type
+            FROM pairs p
+            CROSS JOIN LATERAL (
+                SELECT ticker, signal_type FROM signals s
+                WHERE s.ticker = p.ticker AND s.signal_type > p.signal_type
+                ORDER BY signal_type LIMIT 1
+            ) n"""
+    else:
+        pairs = """
+            (SELECT ticker, signal_type FROM signals ORDER BY ticker, signal_type LIMIT 1)
+            UNION ALL
+            SELECT n.ticker, n.signal_type
+            FROM pairs p
+            CROSS JOIN LATERAL (
+                SELECT ticker, signal_type FROM signals s
+                WHERE (s.ticker, s.signal_type) > (p.ticker, p.signal_type)
+                ORDER BY ticker, signal_type LIMIT 1
+            ) n"""
+    return f"""
+        WITH RECURSIVE pairs AS ({pairs}
+        )
+        SELECT l.ticker, l.signal_type, l.action, l.signal_value, l.strength, l.message, l.timestamp
+        FROM pairs p
+        CROSS JOIN LATERAL (
+            SELECT ticker, signal_type, action, signal_value, strength, message, timestamp
+            FROM signals s
+            WHERE s.ticker = p.ticker AND s.signal_type = p.signal_type
+              AND s.timestamp >= NOW() - {p(since, '::text')}::interval
+              AND {_hourly_only(p, "s.strategy")}
+            ORDER BY s.timestamp DESC LIMIT 1
+        ) l
+        ORDER BY l.ticker, l.signal_type
+    """, p.args
+
+def signals_summary_query(ph, *, group_by: str, since: str, intraday: bool = False):
+    """Signal counts in the window per action (group_by="action") or per signal_type, as (key, count)."""
+    p = _Params(ph)
+    col = "action" if group_by == "action" else "signal_type"
+    where = f"timestamp >= NOW() - {p(since, '::text')}::interval"
+    if not intraday:
+        where += f" AND {_hourly_only(p)}"
+    return f"""
+        SELECT {col} AS key, COUNT(*) AS count
+        FROM signals
+        WHERE {where}
+        GROUP BY {col}
+        ORDER BY count DESC
+    """, p.args
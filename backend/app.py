@@ -1,39 +1,36 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import psycopg2
 import pandas as pd
-from datetime import datetime, timedelta, timezone
 
 import config
-from signals_engine import run_for_ticker  # unified orchestrator
+import db_query
+from api_common import (
+    SIGNALS_PAGE_MAX, parse_actions, parse_flag, parse_since, parse_tickers,
+    range_start, decimate, encode_cursor, decode_cursor,
+    PH_PSYCOPG, prices_query, signals_page_query, latest_signals_query, signals_summary_query,
+)
+import jobs  # background queue around signals_engine.run_for_ticker
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor"])
 
 def _conn():
-    return psycopg2.connect(
-        dbname=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
-        host=config.DB_HOST, port=config.DB_PORT
-    )
-
-# --- helpers ---
-def _parse_actions(s: str | None):
-    if not s:
-        return ["BUY", "SELL", "NEUTRAL"]
-    vals = [v.strip().upper() for v in s.split(",") if v.strip()]
-    return [v for v in vals if v in ("BUY", "SELL", "NEUTRAL")] or ["BUY", "SELL", "NEUTRAL"]
-
-def _parse_since(s: str | None):
-    if not s:  # default 7d
-        return "7 days"
-    s = s.strip().lower()
-    if s.endswith("h"):
-        return f"{int(s[:-1])} hours"
-    if s.endswith("d"):
-        return f"{int(s[:-1])} days"
-    if s.endswith("m"):
-        return f"{int(s[:-1])} minutes"
-    return "7 days"
+    return db_query.connect(options=f"-c statement_timeout={config.API_STATEMENT_TIMEOUT_MS}")
+
+# --- helpers (parsing / paging live in api_common, shared with app_async.py) ---
+def _page_response(df: pd.DataFrame, limit: int):
+    """Trim the limit+1 probe row, emit records plus X-Next-Cursor when more rows exist."""
+    next_cursor = None
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        last = df.iloc[-1]
+        next_cursor = encode_cursor(last["timestamp"], last["id"])
+    df = df.drop(columns=["id"])
+    df["timestamp"] = df["timestamp"].apply(lambda t: t.isoformat())
+    resp = jsonify(df.to_dict(orient="records"))
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
 
 # --- health ---
 @app.route("/health")
@@ -45,40 +42,38 @@ def health():
 def price_history(ticker):
     try:
         range_param = request.args.get("range", default="All")
-        now = datetime.now(timezone.utc)
-        rng = {
-            "24h": now - timedelta(days=1),
-            "7d":  now - timedelta(days=7),
-            "30d": now - timedelta(days=30),
-            "90d": now - timedelta(days=90),
-            "All": None
-        }.get(range_param, None)
+        rng = range_start(range_param)
 
+        sql, args = prices_query(PH_PSYCOPG, [ticker], rng)
         with _conn() as conn, conn.cursor() as cur:
-            if rng:
-                cur.execute("""
-                    SELECT timestamp, price
-                    FROM prices
-                    WHERE ticker=%s AND timestamp >= %s
-                    ORDER BY timestamp ASC
-                """, (ticker, rng))
-            else:
-                cur.execute("""
-                    SELECT timestamp, price
-                    FROM prices
-                    WHERE ticker=%s
-                    ORDER BY timestamp ASC
-                """, (ticker,))
+            cur.execute(sql, args)
             rows = cur.fetchall()
 
-        data = [{"timestamp": r[0].isoformat(), "price": float(r[1])} for r in rows]
+        data = [{"timestamp": ts.isoformat(), "price": float(price)} for _, ts, price in rows]
+        return jsonify(decimate(data, range_param))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- prices: batch (?tickers=AAPL,MSFT&range=7d) → {ticker: [same shape as /prices/<ticker>]} ---
+@app.route("/prices")
+def price_history_batch():
+    try:
+        tickers = parse_tickers(request.args.get("tickers"))
+        if not tickers:
+            return jsonify({"error": "tickers query param required"}), 400
+        range_param = request.args.get("range", default="All")
+        rng = range_start(range_param)
 
-        # lightweight decimation for long ranges
-        if range_param in {"30d", "90d", "All"} and len(data) > 100:
-            step = 4 if range_param == "30d" else 6
-            data = data[::step]
+        # one round trip; rows arrive grouped by ticker via uq_prices_t_ts
+        sql, args = prices_query(PH_PSYCOPG, tickers, rng)
+        with _conn() as conn, conn.cursor() as cur:
+            cur.execute(sql, args)
+            rows = cur.fetchall()
 
-        return jsonify(data)
+        out = {t: [] for t in tickers}
+        for t, ts, price in rows:
+            out[t].append({"timestamp": ts.isoformat(), "price": float(price)})
+        return jsonify({t: decimate(data, range_param) for t, data in out.items()})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -86,21 +81,21 @@ def price_history(ticker):
 @app.route("/signals/recent")
 def signals_recent():
     try:
-        limit = max(1, min(int(request.args.get("limit", 50)), 200))
-        actions = _parse_actions(request.args.get("actions"))
-        since   = _parse_since(request.args.get("since"))
-
+        limit = max(1, min(int(request.args.get("limit", 50)), SIGNALS_PAGE_MAX))
+        actions = parse_actions(request.args.get("actions"))
+        since   = parse_since(request.args.get("since"))
+        try:
+            cur_ts, cur_id = decode_cursor(request.args.get("cursor"))
+        except ValueError:
+            return jsonify({"error": "invalid cursor"}), 400
+
+        sql, args = signals_page_query(PH_PSYCOPG, actions=actions, since=since,
+                                       cursor=(cur_ts, cur_id), limit=limit,
+                                       intraday=parse_flag(request.args.get("intraday")))
         with _conn() as conn:
-            df = pd.read_sql("""
-                SELECT timestamp, ticker, signal_type, action, signal_value, strength, message
-                FROM signals
-                WHERE action = ANY(%s) AND timestamp >= NOW() - (%s)::interval
-                ORDER BY timestamp DESC
-                LIMIT %s
-            """, conn, params=(actions, since, limit))
-
-        df["timestamp"] = df["timestamp"].apply(lambda t: t.isoformat())
-        return jsonify(df.to_dict(orient="records"))
+            df = pd.read_sql(sql, conn, params=args)
+
+        return _page_response(df, limit)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -108,22 +103,47 @@ def signals_recent():
 @app.route("/signals/by/<ticker>")
 def signals_by_ticker(ticker):
     try:
-        limit = max(1, min(int(request.args.get("limit", 50)), 200))
-        actions = _parse_actions(request.args.get("actions"))
-        since   = _parse_since(request.args.get("since"))
-
+        limit = max(1, min(int(request.args.get("limit", 50)), SIGNALS_PAGE_MAX))
+        actions = parse_actions(request.args.get("actions"))
+        since   = parse_since(request.args.get("since"))
+        try:
+            cur_ts, cur_id = decode_cursor(request.args.get("cursor"))
+        except ValueError:
+            return jsonify({"error": "invalid cursor"}), 400
+
+        sql, args = signals_page_query(PH_PSYCOPG, actions=actions, since=since,
+                                       cursor=(cur_ts, cur_id), limit=limit, ticker=ticker,
+                                       intraday=parse_flag(request.args.get("intraday")))
         with _conn() as conn:
-            df = pd.read_sql("""
-                SELECT timestamp, signal_type, action, signal_value, strength, message
-                FROM signals
-                WHERE ticker = %s AND action = ANY(%s)
-                  AND timestamp >= NOW() - (%s)::interval
-                ORDER BY timestamp DESC
-                LIMIT %s
-            """, conn, params=(ticker, actions, since, limit))
-
-        df["timestamp"] = df["timestamp"].apply(lambda t: t.isoformat())
-        return jsonify(df.to_dict(orient="records"))
+            df = pd.read_sql(sql, conn, params=args)
+
+        return _page_response(df, limit)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- signals: latest action per ticker × signal type ---
+@app.route("/signals/latest")
+def signals_latest():
+    try:
+        tickers = parse_tickers(request.args.get("tickers"))
+        since   = parse_since(request.args.get("since"))
+
+        # loose index scan over idx_signals_ticker_type_ts (see api_common.latest_signals_query)
+        sql, args = latest_signals_query(PH_PSYCOPG, tickers=tickers, since=since)
+        with _conn() as conn, conn.cursor() as cur:
+            cur.execute(sql, args)
+            rows = cur.fetchall()
+
+        matrix = {t: {} for t in tickers}
+        for t, stype, action, value, strength, message, ts in rows:
+            matrix.setdefault(t, {})[stype] = {
+                "action": action,
+                "signal_value": None if value is None else float(value),
+                "strength": strength,
+                "message": message,
+                "timestamp": ts.isoformat(),
+            }
+        return jsonify(matrix)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -132,44 +152,59 @@ def signals_by_ticker(ticker):
 def signals_summary():
     try:
         group_by = request.args.get("group_by", "signal_type").lower()
-        since    = _parse_since(request.args.get("since"))
-
-        if group_by == "action":
-            sql = """
-              SELECT action, COUNT(*) AS count
-              FROM signals
-              WHERE timestamp >= NOW() - (%s)::interval
-              GROUP BY action
-              ORDER BY count DESC
-            """
-            key = "action"
-        else:
-            sql = """
-              SELECT signal_type AS type, COUNT(*) AS count
-              FROM signals
-              WHERE timestamp >= NOW() - (%s)::interval
-              GROUP BY signal_type
-              ORDER BY count DESC
-            """
-            key = "type"
+        since    = parse_since(request.args.get("since"))
+        key = "action" if group_by == "action" else "type"
 
+        sql, args = signals_summary_query(PH_PSYCOPG, group_by=group_by, since=since,
+                                          intraday=parse_flag(request.args.get("intraday")))
         with _conn() as conn:
-            df = pd.read_sql(sql, conn, params=(since,))
+            df = pd.read_sql(sql, conn, params=args)
 
         # normalize keys so existing charts work (type/count or action/count)
-        return jsonify([{key: row[key], "count": int(row["count"])} for _, row in df.iterrows()])
+        return jsonify([{key: row["key"], "count": int(row["count"])} for _, row in df.iterrows()])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- query stats (this process; see db_query.py) ---
+@app.route("/debug/queries")
+def debug_queries():
+    # plans carry literal filter values: keep this off the public API unless asked for
+    if not config.DEBUG_QUERIES_ENABLED:
+        return jsonify({"error": "not found"}), 404
+    try:
+        n = max(1, min(int(request.args.get("n", 20)), 200))
+        return jsonify(db_query.report(n, request.args.get("order_by", "total_ms")))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# --- manual trigger (button) ---
+# --- manual trigger (button): queued, poll /signals/jobs/<id> ---
 @app.route("/signals/generate/<ticker>", methods=["POST"])
 def signals_generate(ticker):
     try:
-        summary = run_for_ticker(ticker, triggered_by="manual")
-        return jsonify({"status": "ok", **summary})
+        job_id, deduped = jobs.enqueue(ticker)
+        return jsonify({"status": "queued", "job_id": job_id, "deduped": deduped}), 202
+    except jobs.QueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route("/signals/jobs/<int:job_id>")
+def signals_job_status(job_id):
+    try:
+        job = jobs.get_job(job_id)
+        if job is None:
+            return jsonify({"error": "job not found"}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/signals/jobs/stats")
+def signals_job_stats():
+    try:
+        return jsonify(jobs.stats(parse_since(request.args.get("since", "1h"))))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 if __name__ == "__main__":
     # For local dev only; EB will run via gunicorn
     app.run(host="0.0.0.0", port=5000, debug=True)
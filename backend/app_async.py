@@ -0,0 +1,248 @@
+# app_async.py
+"""
+Async serving mode: the app.py routes on Quart + an asyncpg pool.
+
+Same paths, query params and response shapes as app.py, but one process
+multiplexes hundreds of in-flight requests over a small shared pool instead
+of pinning a sync worker (and a fresh connection) per request.
+
+  uvicorn app_async:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import time
+
+import asyncpg
+from quart import Quart, jsonify, request
+from quart_cors import cors
+
+import config
+import db_query
+from api_common import (
+    SIGNALS_PAGE_MAX, parse_actions, parse_flag, parse_since, parse_tickers,
+    range_start, decimate, decode_cursor, page_rows,
+    PH_ASYNCPG, prices_query, signals_page_query, latest_signals_query, signals_summary_query,
+)
+import jobs  # sync psycopg2 + thread pool; called via asyncio.to_thread
+
+app = cors(Quart(__name__), expose_headers=["X-Next-Cursor"])
+_pool: asyncpg.Pool | None = None
+
+
+@app.before_serving
+async def _open_pool():
+    global _pool
+    _pool = await asyncpg.create_pool(
+        database=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
+        host=config.DB_HOST, port=int(config.DB_PORT),
+        min_size=config.ASYNC_DB_POOL_MIN, max_size=config.ASYNC_DB_POOL_MAX,
+        server_settings={"statement_timeout": str(config.API_STATEMENT_TIMEOUT_MS)},
+    )
+
+
+@app.after_serving
+async def _close_pool():
+    if _pool is not None:
+        await _pool.close()
+
+
+async def _fetch(sql: str, *args):
+    """pool.fetch timed into the same db_query stats as the sync app."""
+    t0 = time.perf_counter()
+    rows = await _pool.fetch(sql, *args)
+    db_query.record(sql, args, (time.perf_counter() - t0) * 1000, len(rows))
+    return rows
+
+
+def _f(v):
+    return None if v is None else float(v)
+
+
+def _signal_rows(records, with_ticker: bool):
+    out = []
+    for r in records:
+        row = {"id": r["id"], "timestamp": r["timestamp"]}
+        if with_ticker:
+            row["ticker"] = r["ticker"]
+        row.update({
+            "signal_type": r["signal_type"], "action": r["action"],
+            "signal_value": _f(r["signal_value"]), "strength": r["strength"], "message": r["message"],
+        })
+        out.append(row)
+    return out
+
+
+def _page_response(rows, limit: int):
+    rows, next_cursor = page_rows(rows, limit)
+    body = []
+    for row in rows:
+        row = dict(row)
+        del row["id"]
+        row["timestamp"] = row["timestamp"].isoformat()
+        body.append(row)
+    resp = jsonify(body)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
+
+
+# --- health ---
+@app.route("/health")
+async def health():
+    return jsonify({"ok": True})
+
+
+# --- prices ---
+@app.route("/prices/<ticker>")
+async def price_history(ticker):
+    try:
+        range_param = request.args.get("range", default="All")
+        rng = range_start(range_param)
+        sql, args = prices_query(PH_ASYNCPG, [ticker], rng)
+        rows = await _fetch(sql, *args)
+        data = [{"timestamp": r["timestamp"].isoformat(), "price": float(r["price"])} for r in rows]
+        return jsonify(decimate(data, range_param))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/prices")
+async def price_history_batch():
+    try:
+        tickers = parse_tickers(request.args.get("tickers"))
+        if not tickers:
+            return jsonify({"error": "tickers query param required"}), 400
+        range_param = request.args.get("range", default="All")
+        rng = range_start(range_param)
+        sql, args = prices_query(PH_ASYNCPG, tickers, rng)
+        rows = await _fetch(sql, *args)
+        out = {t: [] for t in tickers}
+        for r in rows:
+            out[r["ticker"]].append({"timestamp": r["timestamp"].isoformat(), "price": float(r["price"])})
+        return jsonify({t: decimate(data, range_param) for t, data in out.items()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# --- signals ---
+@app.route("/signals/recent")
+async def signals_recent():
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), SIGNALS_PAGE_MAX))
+        actions = parse_actions(request.args.get("actions"))
+        since   = parse_since(request.args.get("since"))
+        try:
+            cur_ts, cur_id = decode_cursor(request.args.get("cursor"))
+        except ValueError:
+            return jsonify({"error": "invalid cursor"}), 400
+
+        sql, args = signals_page_query(PH_ASYNCPG, actions=actions, since=since,
+                                       cursor=(cur_ts, cur_id), limit=limit,
+                                       intraday=parse_flag(request.args.get("intraday")))
+        records = await _fetch(sql, *args)
+        return _page_response(_signal_rows(records, with_ticker=True), limit)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/signals/by/<ticker>")
+async def signals_by_ticker(ticker):
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), SIGNALS_PAGE_MAX))
+        actions = parse_actions(request.args.get("actions"))
+        since   = parse_since(request.args.get("since"))
+        try:
+            cur_ts, cur_id = decode_cursor(request.args.get("cursor"))
+        except ValueError:
+            return jsonify({"error": "invalid cursor"}), 400
+
+        sql, args = signals_page_query(PH_ASYNCPG, actions=actions, since=since,
+                                       cursor=(cur_ts, cur_id), limit=limit, ticker=ticker,
+                                       intraday=parse_flag(request.args.get("intraday")))
+        records = await _fetch(sql, *args)
+        return _page_response(_signal_rows(records, with_ticker=False), limit)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/signals/latest")
+async def signals_latest():
+    try:
+        tickers = parse_tickers(request.args.get("tickers"))
+        since   = parse_since(request.args.get("since"))
+        # loose index scan over idx_signals_ticker_type_ts (see api_common.latest_signals_query)
+        sql, args = latest_signals_query(PH_ASYNCPG, tickers=tickers, since=since)
+        rows = await _fetch(sql, *args)
+        matrix = {t: {} for t in tickers}
+        for r in rows:
+            matrix.setdefault(r["ticker"], {})[r["signal_type"]] = {
+                "action": r["action"],
+                "signal_value": _f(r["signal_value"]),
+                "strength": r["strength"],
+                "message": r["message"],
+                "timestamp": r["timestamp"].isoformat(),
+            }
+        return jsonify(matrix)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/signals/summary")
+async def signals_summary():
+    try:
+        group_by = request.args.get("group_by", "signal_type").lower()
+        since    = parse_since(request.args.get("since"))
+        key = "action" if group_by == "action" else "type"
+        sql, args = signals_summary_query(PH_ASYNCPG, group_by=group_by, since=since,
+                                          intraday=parse_flag(request.args.get("intraday")))
+        rows = await _fetch(sql, *args)
+        return jsonify([{key: r["key"], "count": int(r["count"])} for r in rows])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/debug/queries")
+async def debug_queries():
+    # plans carry literal filter values: keep this off the public API unless asked for
+    if not config.DEBUG_QUERIES_ENABLED:
+        return jsonify({"error": "not found"}), 404
+    try:
+        n = max(1, min(int(request.args.get("n", 20)), 200))
+        return jsonify(db_query.report(n, request.args.get("order_by", "total_ms")))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# --- generation jobs (see jobs.py) ---
+@app.route("/signals/generate/<ticker>", methods=["POST"])
+async def signals_generate(ticker):
+    try:
+        job_id, deduped = await asyncio.to_thread(jobs.enqueue, ticker)
+        return jsonify({"status": "queued", "job_id": job_id, "deduped": deduped}), 202
+    except jobs.QueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/signals/jobs/<int:job_id>")
+async def signals_job_status(job_id):
+    try:
+        job = await asyncio.to_thread(jobs.get_job, job_id)
+        if job is None:
+            return jsonify({"error": "job not found"}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/signals/jobs/stats")
+async def signals_job_stats():
+    try:
+        return jsonify(await asyncio.to_thread(jobs.stats, parse_since(request.args.get("since", "1h"))))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+if __name__ == "__main__":
+    # local dev only; production: uvicorn app_async:app
+    app.run(host="0.0.0.0", port=8000)
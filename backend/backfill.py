@@ -0,0 +1,303 @@
+# backfill.py
+"""
+High-throughput historical loader for `prices`.
+
+Reads bars from local CSV/Parquet files (or a pluggable source) on parallel
+readers and writes them with COPY into a temp staging table, then
+INSERT ... ON CONFLICT DO NOTHING into prices, so re-runs are idempotent.
+Progress is checkpointed per (job, source file, ticker) in
+backfill_checkpoints inside the same transaction as each chunk, so an
+interrupted run resumes where it stopped even when one ticker is spread over
+several files loaded in parallel. At most BACKFILL_MAX_PENDING frames wait
+for a writer, so memory stays bounded on large datasets. Large loads can
+drop idx_prices_ts and rebuild it once at the end.
+
+  python backfill.py --path ./history --job seed-2024
+  python backfill.py --source my_vendor:load_bars --tickers AAPL,MSFT --job vendor
+  python backfill.py --path ./history --defer-indexes --readers 8 --writers 4
+
+Files: one per ticker (<TICKER>.csv / .parquet) or any file with a `ticker`
+column. Columns: timestamp|date|datetime, close|price, optional volume.
+A pluggable source is "module:callable" taking a ticker and returning such
+a frame.
+
+NOTE: insert_price trims bars older than PRICES_RETENTION_DAYS on every
+ingest; set it to 0 (or large enough) before loading years of history.
+"""
+import argparse
+import importlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import config
+import db_query
+
+_STAGE_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS backfill_stage (
+  ticker TEXT, price REAL, volume BIGINT, timestamp TIMESTAMPTZ
+) ON COMMIT DELETE ROWS;
+"""
+_SECONDARY_INDEXES = {"idx_prices_ts": "CREATE INDEX IF NOT EXISTS idx_prices_ts ON prices(timestamp)"}
+
+_TS_COLS = ("timestamp", "datetime", "date", "time")
+_PX_COLS = ("close", "price", "adj_close")
+
+
+# ====== READERS ======
+def normalize_frame(df: pd.DataFrame, ticker: Optional[str] = None) -> pd.DataFrame:
+    """Any bar frame → columns [ticker, price, volume, timestamp] (UTC), sorted, no NaN prices."""
+    df = df.rename(columns={c: str(c).strip().lower().replace(" ", "_") for c in df.columns})
+    if not any(c in df.columns for c in _TS_COLS) and isinstance(df.index, pd.DatetimeIndex):
+        df = df.reset_index().rename(columns={"index": "timestamp"})
+        df.columns = [str(c).lower() for c in df.columns]
+    ts_col = next(c for c in _TS_COLS if c in df.columns)
+    px_col = next(c for c in _PX_COLS if c in df.columns)
+    out = pd.DataFrame({
+        "ticker": df["ticker"].astype(str) if "ticker" in df.columns else ticker,
+        "price": pd.to_numeric(df[px_col], errors="coerce"),
+        "volume": pd.to_numeric(df["volume"], errors="coerce").fillna(0).astype("int64") if "volume" in df.columns else 0,
+        "timestamp": pd.to_datetime(df[ts_col], utc=True, errors="coerce"),
+    })
+    out = out.dropna(subset=["price", "timestamp", "ticker"])
+    return out.sort_values(["ticker", "timestamp"], kind="stable")
+
+
+def read_file(path: str) -> pd.DataFrame:
+    ticker = os.path.splitext(os.path.basename(path))[0]
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    return normalize_frame(df, ticker)
+
+
+def list_files(path: str) -> List[str]:
+    if os.path.isfile(path):
+        return [path]
+    return sorted(
+        os.path.join(path, f) for f in os.listdir(path)
+        if f.endswith((".csv", ".parquet"))
+    )
+
+
+def load_source(spec: str) -> Callable[[str], pd.DataFrame]:
+    mod, _, fn = spec.partition(":")
+    return getattr(importlib.import_module(mod), fn or "load_bars")
+
+
+def read_source(fn: Callable[[str], pd.DataFrame], ticker: str) -> pd.DataFrame:
+    return normalize_frame(fn(ticker), ticker)
+
+
+# ====== WRITER ======
+class Writer:
+    """COPY-based chunk writer; one connection per writer thread."""
+
+    def __init__(self, job: str, chunk_rows: int):
+        self.job = job
+        self.chunk_rows = chunk_rows
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.rows_read = 0
+        self.rows_inserted = 0
+        self._conns = []
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = db_query.connect()
+            with conn.cursor() as cur:
+                cur.execute("SET synchronous_commit = off")   # bulk load: durability comes from the checkpoint
+                cur.execute(_STAGE_DDL)
+            conn.commit()
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def checkpoints(self) -> Dict[Tuple[str, str], pd.Timestamp]:
+        with db_query.connect() as conn, conn.cursor() as cur:
+            cur.execute("SELECT source, ticker, last_ts FROM backfill_checkpoints WHERE job = %s", (self.job,))
+            return {(src, t): pd.Timestamp(ts) for src, t, ts in cur.fetchall()}
+
+    def write(self, df: pd.DataFrame, source: str, resume_from: Dict[Tuple[str, str], pd.Timestamp]) -> int:
+        # one source's rows for a ticker are written in order by a single thread,
+        # so its checkpoint only ever moves forward
+        inserted = 0
+        for ticker, part in df.groupby("ticker", sort=False):
+            last = resume_from.get((source, ticker))
+            if last is not None:
+                part = part[part["timestamp"] > last]
+            for start in range(0, len(part), self.chunk_rows):
+                inserted += self._write_chunk(source, ticker, part.iloc[start:start + self.chunk_rows])
+        return inserted
+
+    def _write_chunk(self, source: str, ticker: str, chunk: pd.DataFrame) -> int:
+        if chunk.empty:
+            return 0
+        buf = io.StringIO()
+        chunk[["ticker", "price", "volume", "timestamp"]].to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        conn = self._conn()
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert("COPY backfill_stage (ticker, price, volume, timestamp) FROM STDIN WITH (FORMAT csv)", buf)
+                cur.execute("""
+                    INSERT INTO prices (ticker, price, volume, timestamp)
+                    SELECT ticker, price, volume, timestamp FROM backfill_stage
+                    ON CONFLICT (ticker, timestamp) DO NOTHING
+                """)
+                inserted = cur.rowcount
+                cur.execute("""
+                    INSERT INTO backfill_checkpoints (job, source, ticker, last_ts, rows_loaded, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, NOW())
+                    ON CONFLICT (job, source, ticker) DO UPDATE SET
+                        last_ts     = EXCLUDED.last_ts,
+                        rows_loaded = backfill_checkpoints.rows_loaded + EXCLUDED.rows_loaded,
+                        updated_at  = EXCLUDED.updated_at
+                """, (self.job, source, ticker, chunk["timestamp"].iloc[-1].to_pydatetime(), inserted))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        with self._lock:
+            self.rows_read += len(chunk)
+            self.rows_inserted += inserted
+        return inserted
+
+    def close(self):
+        for conn in self._conns:
+            try: conn.close()
+            except: pass
+
+
+# ====== INDEX MANAGEMENT ======
+def drop_secondary_indexes():
+    with db_query.connect() as conn, conn.cursor() as cur:
+        for name in _SECONDARY_INDEXES:
+            cur.execute(f"DROP INDEX IF EXISTS {name}")
+    print(f"[backfill] dropped {', '.join(_SECONDARY_INDEXES)} for the load")
+
+
+def rebuild_secondary_indexes():
+    t0 = time.perf_counter()
+    with db_query.connect() as conn, conn.cursor() as cur:
+        cur.execute("SET maintenance_work_mem = '512MB'")
+        for ddl in _SECONDARY_INDEXES.values():
+            cur.execute(ddl)
+        cur.execute("ANALYZE prices")
+    print(f"[backfill] rebuilt indexes + ANALYZE in {time.perf_counter() - t0:.1f}s")
+
+
+# ====== DRIVER ======
+def run(args) -> Dict[str, object]:
+    if config.PRICES_RETENTION_DAYS > 0:
+        print(f"[backfill] WARNING: PRICES_RETENTION_DAYS={config.PRICES_RETENTION_DAYS}; "
+              f"insert_price will trim older bars on the next ingest")
+
+    writer = Writer(args.job, args.chunk_rows)
+    resume_from = {} if args.restart else writer.checkpoints()
+    if resume_from:
+        print(f"[backfill] resuming job={args.job}: {len(resume_from)} (source, ticker) checkpoints")
+
+    # (checkpoint source, reader call); sources are paths relative to --path
+    if args.source:
+        fn = load_source(args.source)
+        tickers = [t.strip() for t in (args.tickers or "").split(",") if t.strip()]
+        readers = ThreadPoolExecutor(max_workers=args.readers)
+        tasks = [(args.source, partial(read_source, fn, t)) for t in tickers]
+    else:
+        root = args.path if os.path.isdir(args.path) else os.path.dirname(args.path)
+        readers = ProcessPoolExecutor(max_workers=args.readers)
+        tasks = [(os.path.relpath(f, root), partial(read_file, f)) for f in list_files(args.path)]
+
+    if args.defer_indexes:
+        drop_secondary_indexes()
+
+    t0 = time.perf_counter()
+    errors: List[str] = []
+    # frames read but not yet written; reads stop while this many wait for a writer
+    slots = threading.BoundedSemaphore(max(1, args.max_pending))
+    try:
+        with ThreadPoolExecutor(max_workers=args.writers) as writers:
+            pending = []
+            reads: Dict[object, str] = {}
+            todo = iter(tasks)
+
+            def _next_read():
+                for src, call in todo:
+                    reads[readers.submit(call)] = src
+                    return
+
+            for _ in range(args.readers):
+                _next_read()
+            while reads:
+                done, _ = wait(reads, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    src = reads.pop(fut)
+                    try:
+                        df = fut.result()
+                    except Exception as e:
+                        errors.append(f"read:{src}:{e}")
+                        print(f"[backfill] read error {src}: {e}")
+                        _next_read()
+                        continue
+                    slots.acquire()
+                    w = writers.submit(writer.write, df, src, resume_from)
+                    w.add_done_callback(lambda _f: slots.release())
+                    pending.append(w)
+                    del df, fut
+                    _next_read()
+            for w in as_completed(pending):
+                try:
+                    w.result()
+                except Exception as e:
+                    errors.append(f"write:{e}")
+                    print(f"[backfill] write error: {e}")
+                elapsed = time.perf_counter() - t0
+                print(f"[backfill] rows={writer.rows_read} inserted={writer.rows_inserted} "
+                      f"rate={writer.rows_read / max(elapsed, 1e-9):,.0f} rows/s")
+    finally:
+        readers.shutdown(wait=True)
+        writer.close()
+        if args.defer_indexes:
+            rebuild_secondary_indexes()
+
+    elapsed = time.perf_counter() - t0
+    report = {
+        "job": args.job,
+        "rows_read": writer.rows_read,
+        "rows_inserted": writer.rows_inserted,
+        "elapsed_sec": round(elapsed, 2),
+        "rows_per_sec": round(writer.rows_read / max(elapsed, 1e-9), 1),
+        "errors": errors,
+    }
+    print(f"[backfill] done {report}")
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bulk-load historical bars into prices")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--path", help="CSV/Parquet file or directory")
+    src.add_argument("--source", help="pluggable source 'module:callable' (ticker -> DataFrame)")
+    ap.add_argument("--tickers", help="comma list for --source")
+    ap.add_argument("--job", default="default", help="checkpoint namespace; reuse it to resume")
+    ap.add_argument("--restart", action="store_true", help="ignore existing checkpoints for this job")
+    ap.add_argument("--readers", type=int, default=config.BACKFILL_READERS)
+    ap.add_argument("--writers", type=int, default=config.BACKFILL_WRITERS)
+    ap.add_argument("--chunk-rows", type=int, default=config.BACKFILL_CHUNK_ROWS)
+    ap.add_argument("--max-pending", type=int, default=config.BACKFILL_MAX_PENDING, help="frames held in memory awaiting a writer")
+    ap.add_argument("--defer-indexes", action="store_true", help="drop idx_prices_ts during the load, rebuild after")
+    run(ap.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,10 @@ DB_USER = os.environ.get("DB_USER", "postgres")
 DB_PASSWORD = os.environ.get("DB_PASSWORD", "")
 DB_HOST = os.environ.get("DB_HOST", "127.0.0.1")
 DB_PORT = os.environ.get("DB_PORT", "5432")
+PRICES_RETENTION_DAYS = int(os.environ.get("PRICES_RETENTION_DAYS", "90"))     # 0 disables the per-insert trim
+API_STATEMENT_TIMEOUT_MS = int(os.environ.get("API_STATEMENT_TIMEOUT_MS", "2000"))  # per-query budget for API reads
+ASYNC_DB_POOL_MIN = int(os.environ.get("ASYNC_DB_POOL_MIN", "2"))     # app_async.py asyncpg pool
+ASYNC_DB_POOL_MAX = int(os.environ.get("ASYNC_DB_POOL_MAX", "20"))
 
 def _env_bool(name: str, default: bool = True) -> bool:
     return os.environ.get(name, str(default)).lower() in ("1", "true", "t", "yes", "y", "on")
@@ -26,3 +30,48 @@ INCLUDE_SIGNALS = [s.strip().upper() for s in os.environ.get("INCLUDE_SIGNALS",
 
 # Light regime filter (true = gate BUY/SELL if 50<200 for shorts / 50>200 for longs)
 ENABLE_REGIME_FILTER = _env_bool("ENABLE_REGIME_FILTER", True)
+
+# Indicator math: 'pandas' (reference) or 'numpy' (indicators_np kernels, faster on short series)
+INDICATOR_BACKEND = os.environ.get("INDICATOR_BACKEND", "pandas").lower()
+if INDICATOR_BACKEND not in ("pandas", "numpy"):
+    raise ValueError(f"unknown INDICATOR_BACKEND: {INDICATOR_BACKEND}")
+
+# --- Scheduler (long-running alternative to the Lambda cron) ---
+BAR_INTERVAL_MIN = int(os.environ.get("BAR_INTERVAL_MIN", "60"))
+SCHED_CLOSE_DELAY_SEC = float(os.environ.get("SCHED_CLOSE_DELAY_SEC", "15"))    # let the provider publish the bar
+SCHED_RATE_PER_SEC = float(os.environ.get("SCHED_RATE_PER_SEC", "2"))          # token bucket refill (provider calls/sec)
+SCHED_BURST = int(os.environ.get("SCHED_BURST", "4"))                          # token bucket capacity
+SCHED_FETCH_WORKERS = int(os.environ.get("SCHED_FETCH_WORKERS", "4"))
+SCHED_COMPUTE_WORKERS = int(os.environ.get("SCHED_COMPUTE_WORKERS", "4"))
+SCHED_METRICS_PORT = int(os.environ.get("SCHED_METRICS_PORT", "9108"))          # GET /metrics (JSON); 0 disables
+
+# --- On-demand generation jobs (POST /signals/generate/<ticker>) ---
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))            # threads per API process
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "50"))       # pending jobs per process before 503
+JOB_STALE_SEC = int(os.environ.get("JOB_STALE_SEC", "600"))      # active jobs older than this are failed
+
+# --- Query instrumentation (db_query.py) ---
+QUERY_STATS_ENABLED = _env_bool("QUERY_STATS_ENABLED", True)
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_KEEP = int(os.environ.get("SLOW_QUERY_KEEP", "100"))           # ring buffer of recent slow statements
+EXPLAIN_SAMPLE_RATE = float(os.environ.get("EXPLAIN_SAMPLE_RATE", "0"))   # 0..1 share of slow queries to EXPLAIN
+DEBUG_QUERIES_ENABLED = _env_bool("DEBUG_QUERIES_ENABLED", False)         # serve GET /debug/queries (plans leak literals)
+
+# --- Historical backfill (backfill.py) ---
+BACKFILL_READERS = int(os.environ.get("BACKFILL_READERS", "4"))
+BACKFILL_WRITERS = int(os.environ.get("BACKFILL_WRITERS", "2"))
+BACKFILL_CHUNK_ROWS = int(os.environ.get("BACKFILL_CHUNK_ROWS", "200000"))
+BACKFILL_MAX_PENDING = int(os.environ.get("BACKFILL_MAX_PENDING", "4"))    # read frames waiting for a writer
+
+# --- Streaming mode (streaming.py) ---
+STREAM_BAR_SEC = int(os.environ.get("STREAM_BAR_SEC", "60"))                # bar size built from the feed
+STREAM_GRACE_SEC = float(os.environ.get("STREAM_GRACE_SEC", "2"))           # late ticks accepted before a bar closes
+STREAM_FLUSH_MS = int(os.environ.get("STREAM_FLUSH_MS", "250"))             # micro-batch window for DB writes
+STREAM_FLUSH_ROWS = int(os.environ.get("STREAM_FLUSH_ROWS", "2000"))
+# strategy suffix for non-hourly streamed signals ("MACD_12_26_9_xover@60s"); the hourly
+# views (signal API, alert cooldown) pass it as a query parameter to skip those rows
+INTRADAY_TAG = "@"
+# only hourly bars belong in `prices` (the batch engine reads it as hourly history);
+# they are stored under their open time, like the regular ingest. Unset = decided
+# by the engine's effective bar size (--bar-sec), not STREAM_BAR_SEC
+STREAM_PERSIST_BARS = _env_bool("STREAM_PERSIST_BARS") if "STREAM_PERSIST_BARS" in os.environ else None
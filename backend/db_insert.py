@@ -1,16 +1,14 @@
-import psycopg2
 import json
+from psycopg2.extras import execute_values
 import config
+import db_query
 
 # Insert (idempotent) price bar
 def insert_price(ticker, new_price, volume, timestamp, conn=None, cursor=None):
     close_conn = False
     try:
         if conn is None or cursor is None:
-            conn = psycopg2.connect(
-                dbname=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
-                host=config.DB_HOST, port=config.DB_PORT
-            )
+            conn = db_query.connect()
             cursor = conn.cursor()
             close_conn = True
 
@@ -20,8 +18,10 @@ def insert_price(ticker, new_price, volume, timestamp, conn=None, cursor=None):
             ON CONFLICT (ticker, timestamp) DO NOTHING;
         """, (ticker, new_price, volume, timestamp))
 
-        # keep last 90 days per ticker
-        cursor.execute("DELETE FROM prices WHERE ticker=%s AND timestamp < NOW() - INTERVAL '90 days';", (ticker,))
+        # keep last PRICES_RETENTION_DAYS per ticker (0 = keep everything, e.g. after a backfill)
+        if config.PRICES_RETENTION_DAYS > 0:
+            cursor.execute("DELETE FROM prices WHERE ticker=%s AND timestamp < NOW() - make_interval(days => %s);",
+                           (ticker, config.PRICES_RETENTION_DAYS))
 
         if close_conn:
             conn.commit()
@@ -40,10 +40,7 @@ def get_last_n_prices(ticker, n, conn=None, cursor=None):
     close_conn = False
     try:
         if conn is None or cursor is None:
-            conn = psycopg2.connect(
-                dbname=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
-                host=config.DB_HOST, port=config.DB_PORT
-            )
+            conn = db_query.connect()
             cursor = conn.cursor()
             close_conn = True
 
@@ -85,14 +82,13 @@ def insert_signal(
     """
     Insert or update a row in `signals`. Enforces one row per
     (ticker, signal_type, strategy, bar_ts).
+    Returns True if a row was written, False if the stored row was already
+    identical (no-op), None if the write failed.
     """
     close_conn = False
     try:
         if conn is None or cursor is None:
-            conn = psycopg2.connect(
-                dbname=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
-                host=config.DB_HOST, port=config.DB_PORT
-            )
+            conn = db_query.connect()
             cursor = conn.cursor()
             close_conn = True
 
@@ -117,6 +113,11 @@ def insert_signal(
                 triggered_by = EXCLUDED.triggered_by,
                 message      = EXCLUDED.message,
                 timestamp    = EXCLUDED.timestamp
+            WHERE (signals.action, signals.signal_value, signals.confidence, signals.strength,
+                   signals.params, signals.message, signals.timestamp)
+                  IS DISTINCT FROM
+                  (EXCLUDED.action, EXCLUDED.signal_value, EXCLUDED.confidence, EXCLUDED.strength,
+                   EXCLUDED.params, EXCLUDED.message, EXCLUDED.timestamp)
             ;
         """, {
             "ticker": ticker,
@@ -132,14 +133,157 @@ def insert_signal(
             "timestamp": timestamp,
             "bar_ts": bar_ts or timestamp,  # keep in sync if only timestamp is passed
         })
+        written = cursor.rowcount > 0
 
         cursor.execute(""" DELETE FROM signals WHERE bar_ts < NOW() - INTERVAL '30 days'; """)
 
         if close_conn:
             conn.commit()
-        print(f"Inserted signal: {ticker} {signal_type}/{action} value={signal_value}")
+        if written:
+            print(f"Inserted signal: {ticker} {signal_type}/{action} value={signal_value}")
+        else:
+            print(f"Unchanged signal: {ticker} {signal_type}/{action} (skipped write)")
+        return written
     except Exception as e:
         print("Failed to log signal:", e)
+        return None
+    finally:
+        if close_conn:
+            try: cursor.close()
+            except: pass
+            try: conn.close()
+            except: pass
+
+
+def mark_ticker_processed(ticker, bar_ts, conn=None, cursor=None):
+    """Record the last bar the signal engine computed for `ticker`."""
+    close_conn = False
+    try:
+        if conn is None or cursor is None:
+            conn = db_query.connect()
+            cursor = conn.cursor()
+            close_conn = True
+
+        cursor.execute("""
+            INSERT INTO signal_runs (ticker, last_bar_ts, updated_at)
+            VALUES (%s, %s, NOW())
+            ON CONFLICT (ticker) DO UPDATE SET
+                last_bar_ts = EXCLUDED.last_bar_ts,
+                updated_at  = EXCLUDED.updated_at;
+        """, (ticker, bar_ts))
+
+        if close_conn:
+            conn.commit()
+    except Exception as e:
+        print("Failed to mark ticker processed:", e)
+    finally:
+        if close_conn:
+            try: cursor.close()
+            except: pass
+            try: conn.close()
+            except: pass
+
+
+def insert_prices_batch(rows, conn=None, cursor=None):
+    """
+    Bulk idempotent insert of (ticker, price, volume, timestamp) tuples in one
+    statement. No retention trim here; the regular ingest path handles that.
+    Returns rows inserted, or None on failure. With a caller-owned conn/cursor
+    the error is re-raised instead (the caller's transaction is aborted).
+    """
+    if not rows:
+        return 0
+    close_conn = False
+    try:
+        if conn is None or cursor is None:
+            conn = db_query.connect()
+            cursor = conn.cursor()
+            close_conn = True
+
+        execute_values(cursor, """
+            INSERT INTO prices (ticker, price, volume, timestamp) VALUES %s
+            ON CONFLICT (ticker, timestamp) DO NOTHING
+        """, rows, page_size=len(rows))   # single statement so rowcount covers every row
+        inserted = cursor.rowcount
+
+        if close_conn:
+            conn.commit()
+        return inserted
+    except Exception as e:
+        print("Batch price insert failed:", e)
+        if not close_conn:
+            raise   # caller's transaction is now aborted; let it roll back and account the loss
+        return None
+    finally:
+        if close_conn:
+            try: cursor.close()
+            except: pass
+            try: conn.close()
+            except: pass
+
+
+def insert_signals_batch(signals, conn=None, cursor=None):
+    """
+    Bulk version of insert_signal: `signals` are dicts with insert_signal's
+    keyword names. Same uq_signals_bar upsert and no-op-if-identical rule.
+    Returns rows written, or None on failure; re-raises like insert_prices_batch
+    when the caller owns the connection.
+    """
+    if not signals:
+        return 0
+    # one statement cannot touch the same conflict key twice; keep the latest per key
+    latest = {}
+    for sig in signals:
+        key = (sig["ticker"], sig["signal_type"], sig.get("strategy") or "", sig.get("bar_ts") or sig.get("timestamp"))
+        latest[key] = sig
+    rows = [(
+        sig["ticker"], sig["signal_type"], sig.get("strategy"), sig["action"],
+        sig.get("signal_value"), sig.get("confidence"), sig.get("strength"),
+        json.dumps(sig["params"]) if sig.get("params") else None,
+        sig.get("triggered_by", "auto"), sig.get("message") or "",
+        sig.get("timestamp"), sig.get("bar_ts") or sig.get("timestamp"),
+    ) for sig in latest.values()]
+
+    close_conn = False
+    try:
+        if conn is None or cursor is None:
+            conn = db_query.connect()
+            cursor = conn.cursor()
+            close_conn = True
+
+        execute_values(cursor, """
+            INSERT INTO signals (
+                ticker, signal_type, strategy, action,
+                signal_value, confidence, strength, params,
+                triggered_by, message, timestamp, bar_ts
+            )
+            VALUES %s
+            ON CONFLICT (ticker, signal_type, COALESCE(strategy,''), bar_ts)
+            DO UPDATE SET
+                action       = EXCLUDED.action,
+                signal_value = EXCLUDED.signal_value,
+                confidence   = EXCLUDED.confidence,
+                strength     = EXCLUDED.strength,
+                params       = EXCLUDED.params,
+                triggered_by = EXCLUDED.triggered_by,
+                message      = EXCLUDED.message,
+                timestamp    = EXCLUDED.timestamp
+            WHERE (signals.action, signals.signal_value, signals.confidence, signals.strength,
+                   signals.params, signals.message, signals.timestamp)
+                  IS DISTINCT FROM
+                  (EXCLUDED.action, EXCLUDED.signal_value, EXCLUDED.confidence, EXCLUDED.strength,
+                   EXCLUDED.params, EXCLUDED.message, EXCLUDED.timestamp)
+        """, rows, template="(%s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s, %s, COALESCE(%s, NOW()), %s)", page_size=len(rows))
+        written = cursor.rowcount
+
+        if close_conn:
+            conn.commit()
+        return written
+    except Exception as e:
+        print("Batch signal insert failed:", e)
+        if not close_conn:
+            raise   # caller's transaction is now aborted; let it roll back and account the loss
+        return None
     finally:
         if close_conn:
             try: cursor.close()
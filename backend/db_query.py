@@ -0,0 +1,148 @@
+# db_query.py
+"""
+Instrumented query layer.
+
+`connect()` returns a psycopg2 connection whose cursors time every
+execute(), so existing `cur.execute(...)` / `pd.read_sql(...)` call sites are
+measured without changes. Stats are per process, grouped by normalized SQL:
+calls, rows, total/mean/max latency. Statements slower than SLOW_QUERY_MS
+are kept in a ring buffer, optionally with a sampled EXPLAIN plan, taken
+inside a savepoint (EXPLAIN ANALYZE for plain SELECTs only, so writes are
+never re-run).
+
+`report()` returns the top-N view (served at GET /debug/queries).
+"""
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+import config
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+_slow: deque = deque(maxlen=config.SLOW_QUERY_KEEP)
+
+_WS = re.compile(r"\s+")
+_STR = re.compile(r"'(?:[^']|'')*'")
+_NUM = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUES = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+
+
+def normalize(sql) -> str:
+    """Collapse whitespace and literals so identical statements share one bucket."""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    sql = _STR.sub("?", str(sql))
+    sql = _NUM.sub("?", sql)
+    sql = _WS.sub(" ", sql).strip().rstrip(";").strip()
+    return _VALUES.sub("(...)", sql)   # multi-row VALUES from execute_values
+
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+_SELECT_INTO = re.compile(r"\bINTO\b", re.I)
+
+
+def _explain(conn, sql, params) -> Optional[str]:
+    """
+    Plan for a slow statement, run inside a savepoint on the caller's connection so
+    a failing EXPLAIN (timeout, odd statement) can't abort the caller's transaction.
+    ANALYZE only for plain SELECTs: a data-modifying CTE would execute its write again.
+    """
+    sql = sql.decode("utf-8", "replace") if isinstance(sql, bytes) else str(sql)
+    head = sql.lstrip().upper()
+    if not head.startswith(_EXPLAINABLE):
+        return None
+    plain_select = head.startswith("SELECT") and not _SELECT_INTO.search(head)
+    prefix = "EXPLAIN (ANALYZE, BUFFERS) " if plain_select else "EXPLAIN "
+    use_savepoint = not conn.autocommit
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        try:
+            if use_savepoint:
+                cur.execute("SAVEPOINT db_query_explain")
+            cur.execute(prefix + sql, params)
+            return "\n".join(r[0] for r in cur.fetchall())
+        except Exception as e:
+            return f"<explain failed: {e}>"
+        finally:
+            if use_savepoint:
+                try:
+                    cur.execute("ROLLBACK TO SAVEPOINT db_query_explain")
+                    cur.execute("RELEASE SAVEPOINT db_query_explain")
+                except Exception as e:
+                    print(f"[db-slow] could not release explain savepoint: {e}")
+
+
+def record(sql, params, elapsed_ms: float, rows: int, conn=None):
+    """Account one statement; `conn` (psycopg2) enables sampled EXPLAIN for slow ones."""
+    if not config.QUERY_STATS_ENABLED:
+        return
+    key = normalize(sql)
+    with _lock:
+        s = _stats.get(key)
+        if s is None:
+            s = _stats[key] = {"calls": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0}
+        s["calls"] += 1
+        s["rows"] += max(rows, 0)
+        s["total_ms"] += elapsed_ms
+        s["max_ms"] = max(s["max_ms"], elapsed_ms)
+
+    if elapsed_ms >= config.SLOW_QUERY_MS:
+        plan = None
+        if conn is not None and config.EXPLAIN_SAMPLE_RATE > 0 and random.random() < config.EXPLAIN_SAMPLE_RATE:
+            plan = _explain(conn, sql, params)
+        with _lock:
+            _slow.append({"sql": key, "ms": round(elapsed_ms, 2), "rows": rows,
+                          "at": time.time(), "plan": plan})
+        print(f"[db-slow] {elapsed_ms:.1f}ms rows={rows} {key[:200]}")
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            res = super().execute(query, vars)
+            ok = True
+            return res
+        finally:
+            # no EXPLAIN for failed statements: the transaction is already aborted
+            record(query, vars, (time.perf_counter() - t0) * 1000, self.rowcount, self.connection if ok else None)
+
+
+def connect(**kwargs):
+    """psycopg2.connect with config defaults and timed cursors; kwargs override (e.g. options=...)."""
+    params = dict(
+        dbname=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
+        host=config.DB_HOST, port=config.DB_PORT,
+        cursor_factory=InstrumentedCursor,
+    )
+    params.update(kwargs)
+    return psycopg2.connect(**params)
+
+
+def report(n: int = 20, order_by: str = "total_ms") -> Dict[str, Any]:
+    """Top-N statements by total_ms | mean_ms | max_ms | calls | rows, plus recent slow queries."""
+    with _lock:
+        rows = [
+            {"sql": k, "calls": int(s["calls"]), "rows": int(s["rows"]),
+             "total_ms": round(s["total_ms"], 2), "mean_ms": round(s["total_ms"] / s["calls"], 3),
+             "max_ms": round(s["max_ms"], 2)}
+            for k, s in _stats.items()
+        ]
+        slow = list(_slow)
+    if order_by not in ("total_ms", "mean_ms", "max_ms", "calls", "rows"):
+        order_by = "total_ms"
+    rows.sort(key=lambda r: r[order_by], reverse=True)
+    return {"top": rows[:n], "slow": slow[-n:][::-1], "slow_threshold_ms": config.SLOW_QUERY_MS}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _slow.clear()
@@ -1,7 +1,5 @@
 # db_setup.py
-import psycopg2
-import os
-import config
+import db_query
 
 DDL = """
 CREATE TABLE IF NOT EXISTS prices (
@@ -29,9 +27,50 @@ CREATE TABLE IF NOT EXISTS signals (
   timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
   bar_ts TIMESTAMPTZ
 );
-CREATE INDEX IF NOT EXISTS idx_signals_ts ON signals (timestamp DESC);
-CREATE INDEX IF NOT EXISTS idx_signals_ticker_ts ON signals (ticker, timestamp DESC);
-CREATE INDEX IF NOT EXISTS idx_signals_action_ts ON signals (action, timestamp DESC);
+-- keyset pagination on (timestamp, id); these supersede the old (…, timestamp DESC) indexes
+CREATE INDEX IF NOT EXISTS idx_signals_ts_id ON signals (timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_signals_ticker_ts_id ON signals (ticker, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_signals_action_ts_id ON signals (action, timestamp DESC, id DESC);
+DROP INDEX IF EXISTS idx_signals_ts;
+DROP INDEX IF EXISTS idx_signals_ticker_ts;
+DROP INDEX IF EXISTS idx_signals_action_ts;
+CREATE INDEX IF NOT EXISTS idx_signals_ticker_type_ts ON signals (ticker, signal_type, timestamp DESC);
+
+-- last bar the signal engine processed per ticker (change-driven runs)
+CREATE TABLE IF NOT EXISTS signal_runs (
+  ticker TEXT PRIMARY KEY,
+  last_bar_ts TIMESTAMPTZ NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- on-demand generation jobs (see jobs.py)
+CREATE TABLE IF NOT EXISTS signal_jobs (
+  id BIGSERIAL PRIMARY KEY,
+  ticker TEXT NOT NULL,
+  bar_ts TIMESTAMPTZ,
+  status TEXT NOT NULL DEFAULT 'queued',   -- queued | running | done | failed
+  result JSONB,
+  error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  started_at TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ
+);
+-- single-flight: one active job per (ticker, bar)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_signal_jobs_active
+  ON signal_jobs (ticker, COALESCE(bar_ts, 'epoch'::timestamptz))
+  WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_signal_jobs_status_finished ON signal_jobs (status, finished_at);
+
+-- backfill.py resume points: last bar committed per (job, source file, ticker)
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+  job TEXT NOT NULL,
+  source TEXT NOT NULL,
+  ticker TEXT NOT NULL,
+  last_ts TIMESTAMPTZ NOT NULL,
+  rows_loaded BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (job, source, ticker)
+);
 
 -- one row per (ticker/signal/strategy) per bar
 DO $$
@@ -50,10 +89,7 @@ $$;
 """
 
 def main():
-    conn = psycopg2.connect(
-        dbname=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
-        host=config.DB_HOST, port=config.DB_PORT
-    )
+    conn = db_query.connect()
     with conn, conn.cursor() as cur:
         cur.execute(DDL)
     print("DB setup complete.")
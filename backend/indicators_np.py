@@ -0,0 +1,157 @@
+# indicators_np.py
+"""
+NumPy indicator backend (INDICATOR_BACKEND=numpy).
+
+Same signatures and semantics as the pandas `calculate_*` functions in
+signals_engine, but on contiguous float64 arrays: at LOOKBACK_BARS≈400 the
+pandas Series/rolling/ewm object overhead costs more than the arithmetic.
+Outputs are ndarrays (NaN where pandas would give NaN, bool arrays for
+cross/breakout flags). Inputs may only carry NaNs as a leading run.
+
+EMAs (MACD, RSI) are serial recurrences and run as a Python-float
+accumulate; rolling windows are vectorised (cumulative sums for mean/std,
+sliding_window_view for max/min, O(n·window) but cheap at these windows).
+Parity with pandas: tests/test_indicators_np.py.
+"""
+from itertools import accumulate
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _close(data) -> np.ndarray:
+    """DataFrame with 'close', Series or array → contiguous float64 array."""
+    if hasattr(data, "columns"):
+        data = data["close"]
+    if hasattr(data, "to_numpy"):
+        data = data.to_numpy()
+    return np.ascontiguousarray(data, dtype=np.float64)
+
+
+def _shift1(x: np.ndarray) -> np.ndarray:
+    out = np.empty_like(x)
+    out[:1] = np.nan
+    out[1:] = x[:-1]
+    return out
+
+
+# ====== KERNELS ======
+def _valid_start(x: np.ndarray) -> int:
+    """Index of the first non-NaN value (len(x) when there is none)."""
+    valid = np.flatnonzero(~np.isnan(x))
+    return int(valid[0]) if len(valid) else len(x)
+
+
+def ema(x: np.ndarray, alpha: float, min_periods: int = 0) -> np.ndarray:
+    """Recursive EMA, == pandas ewm(alpha=alpha, adjust=False, min_periods=...).mean()."""
+    n = len(x)
+    out = np.full(n, np.nan)
+    start = _valid_start(x)
+    if start == n:
+        return out
+    beta = 1.0 - alpha
+    # the recurrence is serial; over Python floats it beats per-element ndarray access
+    out[start:] = list(accumulate(x[start:].tolist(), lambda acc, v: beta * acc + alpha * v))
+    if min_periods > 1:
+        out[:start + min_periods - 1] = np.nan
+    return out
+
+
+def ema_span(x: np.ndarray, span: int, min_periods: int = 0) -> np.ndarray:
+    return ema(x, 2.0 / (span + 1.0), min_periods)
+
+
+def wilder(x: np.ndarray, period: int) -> np.ndarray:
+    """Wilder smoothing (alpha = 1/period), first value after `period` observations."""
+    return ema(x, 1.0 / period, min_periods=period)
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Cumulative-sum rolling mean, NaN until `window` observations."""
+    n = len(x)
+    out = np.full(n, np.nan)
+    start = _valid_start(x)   # a leading NaN would poison the whole cumsum
+    if n - start < window:
+        return out
+    c = np.concatenate(([0.0], np.cumsum(x[start:])))
+    out[start + window - 1:] = (c[window:] - c[:-window]) / window
+    return out
+
+
+def rolling_std(x: np.ndarray, window: int, ddof: int = 0) -> np.ndarray:
+    """Cumulative-sum rolling std; values are re-centred first to limit cancellation."""
+    n = len(x)
+    out = np.full(n, np.nan)
+    start = _valid_start(x)
+    if n - start < window or window - ddof <= 0:
+        return out
+    xc = x[start:] - x[start]
+    c1 = np.concatenate(([0.0], np.cumsum(xc)))
+    c2 = np.concatenate(([0.0], np.cumsum(xc * xc)))
+    s1 = c1[window:] - c1[:-window]
+    s2 = c2[window:] - c2[:-window]
+    var = (s2 - s1 * s1 / window) / (window - ddof)
+    out[start + window - 1:] = np.sqrt(np.maximum(var, 0.0))
+    return out
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    """NaN until `window` observations (or while a NaN is in the window), like pandas."""
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = sliding_window_view(x, window).max(axis=1)
+    return out
+
+
+def rolling_min(x: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = sliding_window_view(x, window).min(axis=1)
+    return out
+
+
+# ====== INDICATORS (mirror signals_engine.calculate_*) ======
+def calculate_macd(data, fast: int = 12, slow: int = 26, signal: int = 9):
+    close = _close(data)
+    macd_line = ema_span(close, fast) - ema_span(close, slow)
+    signal_line = ema_span(macd_line, signal)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+def calculate_bollinger(data, window: int = 20, k: float = 2.0):
+    close = _close(data)
+    sma = rolling_mean(close, window)
+    std = rolling_std(close, window, ddof=0)
+    return sma, sma + k * std, sma - k * std
+
+
+def calculate_ma_cross(data, short: int = 50, long: int = 200):
+    close = _close(data)
+    short_ma = rolling_mean(close, short)
+    long_ma = rolling_mean(close, long)
+    prev_above = _shift1(short_ma) > _shift1(long_ma)
+    curr_above = short_ma > long_ma
+    return short_ma, long_ma, (~prev_above) & curr_above, prev_above & (~curr_above)
+
+
+def calculate_rsi(close, period: int = 14):
+    close = _close(close)
+    delta = close - _shift1(close)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain[np.isnan(delta)] = np.nan
+    loss[np.isnan(delta)] = np.nan
+    avg_gain = wilder(gain, period)
+    avg_loss = wilder(loss, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def calculate_close_breakout(data, window: int = 20, use_previous: bool = True):
+    close = _close(data)
+    roll_max = rolling_max(close, window)
+    roll_min = rolling_min(close, window)
+    thresh_max = _shift1(roll_max) if use_previous else roll_max
+    thresh_min = _shift1(roll_min) if use_previous else roll_min
+    return roll_max, roll_min, close > thresh_max, close < thresh_min
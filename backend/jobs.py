@@ -0,0 +1,172 @@
+# jobs.py
+"""
+Background queue for on-demand signal generation.
+
+Jobs live in `signal_jobs` so any gunicorn worker can answer a status poll;
+execution happens on a small thread pool inside the worker that accepted the
+request. At most one job per (ticker, latest bar) is active at a time
+(single-flight), enforced by the partial unique index uq_signal_jobs_active.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+import config
+import db_query
+from signals_engine import run_for_ticker
+
+_pool = ThreadPoolExecutor(max_workers=config.JOB_WORKERS, thread_name_prefix="signal-job")
+_lock = threading.Lock()
+_pending = 0   # jobs submitted to this process's pool and not yet finished
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _conn():
+    return db_query.connect()
+
+
+def _set_status(job_id: int, status: str, *, result: Optional[dict] = None, error: Optional[str] = None):
+    col = "started_at" if status == "running" else "finished_at"
+    with _conn() as conn, conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE signal_jobs
+            SET status = %s, result = COALESCE(%s, result), error = %s, {col} = NOW()
+            WHERE id = %s
+        """, (status, json.dumps(result) if result is not None else None, error, job_id))
+
+
+def _release():
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _run(job_id: int, ticker: str):
+    t0 = time.monotonic()
+    try:
+        _set_status(job_id, "running")
+        summary = run_for_ticker(ticker, triggered_by="manual")
+        _set_status(job_id, "done", result=summary)
+        print(f"[jobs] {job_id} {ticker} done in {time.monotonic() - t0:.2f}s")
+    except Exception as e:
+        print(f"[jobs] {job_id} {ticker} failed: {e}")
+        try:
+            _set_status(job_id, "failed", error=str(e))
+        except Exception as e2:
+            print(f"[jobs] {job_id} could not record failure: {e2}")
+    finally:
+        _release()
+
+
+def enqueue(ticker: str) -> Tuple[int, bool]:
+    """
+    Queue a generation job for `ticker`. Returns (job_id, deduped); deduped is
+    True when an active job for the same ticker and bar already existed.
+    """
+    global _pending
+    # reserve the pool slot up front so concurrent requests can't overshoot JOB_QUEUE_MAX
+    with _lock:
+        if _pending >= config.JOB_QUEUE_MAX:
+            raise QueueFull(f"queue full ({_pending} pending)")
+        _pending += 1
+
+    try:
+        job_id, deduped = _claim(ticker)
+    except Exception:
+        _release()
+        raise
+    if deduped:
+        _release()
+        return job_id, True
+    try:
+        _pool.submit(_run, job_id, ticker)
+    except Exception:
+        _release()
+        raise
+    return job_id, False
+
+
+def _claim(ticker: str) -> Tuple[int, bool]:
+    """Insert the active job for (ticker, latest bar) or return the one already active."""
+    with _conn() as conn, conn.cursor() as cur:
+        # a worker that died mid-job must not block its (ticker, bar) forever
+        cur.execute("""
+            UPDATE signal_jobs SET status = 'failed', error = 'stale', finished_at = NOW()
+            WHERE status IN ('queued', 'running')
+              AND created_at < NOW() - make_interval(secs => %s)
+        """, (config.JOB_STALE_SEC,))
+        cur.execute("SELECT MAX(timestamp) FROM prices WHERE ticker = %s", (ticker,))
+        bar_ts = cur.fetchone()[0]
+        # the active job can finish between INSERT and SELECT; go round again until one wins
+        while True:
+            cur.execute("""
+                INSERT INTO signal_jobs (ticker, bar_ts)
+                VALUES (%s, %s)
+                ON CONFLICT (ticker, COALESCE(bar_ts, 'epoch'::timestamptz))
+                    WHERE status IN ('queued', 'running')
+                DO NOTHING
+                RETURNING id
+            """, (ticker, bar_ts))
+            row = cur.fetchone()
+            if row is not None:
+                return row[0], False
+            cur.execute("""
+                SELECT id FROM signal_jobs
+                WHERE ticker = %s AND bar_ts IS NOT DISTINCT FROM %s
+                  AND status IN ('queued', 'running')
+                ORDER BY id DESC LIMIT 1
+            """, (ticker, bar_ts))
+            found = cur.fetchone()
+            if found:
+                return found[0], True
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    with _conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT id, ticker, bar_ts, status, result, error, created_at, started_at, finished_at
+            FROM signal_jobs WHERE id = %s
+        """, (job_id,))
+        row = cur.fetchone()
+    if not row:
+        return None
+    jid, ticker, bar_ts, status, result, error, created, started, finished = row
+    iso = lambda t: t.isoformat() if t else None
+    return {
+        "job_id": jid, "ticker": ticker, "bar_ts": iso(bar_ts), "status": status,
+        "result": result, "error": error,
+        "created_at": iso(created), "started_at": iso(started), "finished_at": iso(finished),
+        "wait_sec": (started - created).total_seconds() if started else None,
+        "run_sec": (finished - started).total_seconds() if (finished and started) else None,
+    }
+
+
+def stats(window: str = "1 hour") -> Dict[str, Any]:
+    """Queue depth (DB-wide and this process) and job latency over `window`."""
+    with _conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT
+              COUNT(*) FILTER (WHERE status = 'queued'),
+              COUNT(*) FILTER (WHERE status = 'running'),
+              COUNT(*) FILTER (WHERE status = 'done'   AND finished_at >= NOW() - (%s)::interval),
+              COUNT(*) FILTER (WHERE status = 'failed' AND finished_at >= NOW() - (%s)::interval),
+              percentile_cont(0.5)  WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM finished_at - created_at))
+                FILTER (WHERE status = 'done' AND finished_at >= NOW() - (%s)::interval),
+              percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM finished_at - created_at))
+                FILTER (WHERE status = 'done' AND finished_at >= NOW() - (%s)::interval)
+            FROM signal_jobs
+        """, (window, window, window, window))
+        queued, running, done, failed, p50, p95 = cur.fetchone()
+    with _lock:
+        local = _pending
+    return {
+        "queued": queued, "running": running, "done": done, "failed": failed,
+        "local_pending": local, "local_max": config.JOB_QUEUE_MAX,
+        "latency_sec": {"p50": p50, "p95": p95},
+        "window": window,
+    }
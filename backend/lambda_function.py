@@ -13,7 +13,7 @@ def lambda_handler(event, context):
         summary = run_for_all_tickers(TICKERS, triggered_by="auto")
         print("=== Lambda End: ALL OK ===")
         per_ticker_counts = {k: v.get("emitted", 0) for k, v in summary.get("per_ticker", {}).items()}
-        return {"status": "success", "total_emitted": summary.get("total_emitted", 0), "per_ticker": per_ticker_counts, "errors": summary.get("errors", {})}
+        return {"status": "success", "total_emitted": summary.get("total_emitted", 0), "skipped": summary.get("skipped", 0), "computed": summary.get("computed", 0), "written": summary.get("written", 0), "per_ticker": per_ticker_counts, "errors": summary.get("errors", {})}
     except Exception as e:
         print("UNEXPECTED ERROR:", e)
         return {"status": "error", "message": str(e)}
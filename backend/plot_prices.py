@@ -1,5 +1,4 @@
-import psycopg2
-import config
+import db_query
 import pandas as pd
 
 def fetch_price_history(ticker: str) -> pd.DataFrame:
@@ -7,10 +6,7 @@ def fetch_price_history(ticker: str) -> pd.DataFrame:
     Returns DataFrame with columns ['timestamp','price'] ASC.
     """
     try:
-        conn = psycopg2.connect(
-            dbname=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
-            host=config.DB_HOST, port=config.DB_PORT
-        )
+        conn = db_query.connect()
         with conn, conn.cursor() as cur:
             cur.execute("""
                 SELECT timestamp, price
@@ -11,9 +11,33 @@ def _tz_utc(df):
         return df
     return df.tz_localize("UTC") if df.index.tz is None else df.tz_convert("UTC")
 
-def _fetch_hourly_once(ticker: str, period: str, interval: str):
+def _yf_history(ticker: str, period: str, interval: str):
     tk = yf.Ticker(ticker)
-    df = tk.history(period=period, interval=interval, auto_adjust=False, actions=False)
+    return tk.history(period=period, interval=interval, auto_adjust=False, actions=False)
+
+# Market-data source: (ticker, period, interval) -> yfinance-shaped frame (Close/Volume, DatetimeIndex).
+# Swapped out by replay.py for offline runs.
+_history_source = _yf_history
+
+def set_history_source(fn):
+    global _history_source
+    _history_source = fn or _yf_history
+
+# Called before every provider request (retries included); returns False to abort
+# the fetch. scheduler.py installs its token bucket here.
+_call_gate = None
+
+class FetchAborted(Exception):
+    pass
+
+def set_call_gate(fn):
+    global _call_gate
+    _call_gate = fn
+
+def _fetch_hourly_once(ticker: str, period: str, interval: str):
+    if _call_gate is not None and not _call_gate():
+        raise FetchAborted(ticker)
+    df = _history_source(ticker, period, interval)
     if df.empty:
         return None
     df = _tz_utc(df)
@@ -43,28 +67,37 @@ def _fetch_hourly_with_retry(ticker: str):
                     return h
                 else:
                     print(f"[yf] empty for {ticker} ({period}/{interval}) try={i+1}")
+            except FetchAborted:
+                raise
             except Exception as e:
                 print(f"[yf] error {ticker} {period}/{interval} try={i+1}: {e}")
             time.sleep(1.5 * (i + 1))  # backoff
     print(f"[yf] give up {ticker}")
     return None
 
+def fetch_and_store_ticker(t: str, before=None) -> int:
+    """Store hourly bars for `t`; with `before` (UTC), bars opening at or after it are
+    still forming and are left out (insert_price never updates a stored bar)."""
+    h = _fetch_hourly_with_retry(t)
+    if h is not None and before is not None:
+        h = h[h.index < before]
+    if h is None or h.empty:
+        print(f"[ingest] skip {t}: no data")
+        return 0
+    count = 0
+    for ts, row in h.iterrows():
+        insert_price(
+            ticker=t,
+            new_price=float(row["price"]),
+            volume=int((row.get("volume") or 0)),
+            timestamp=ts.to_pydatetime()
+        )
+        count += 1
+    print(f"[ingest] {t}: wrote {count} hourly bars")
+    return count
+
 def fetch_and_store_all():
     total_inserted = 0
     for t in TICKERS:
-        h = _fetch_hourly_with_retry(t)
-        if h is None or h.empty:
-            print(f"[ingest] skip {t}: no data")
-            continue
-        count = 0
-        for ts, row in h.iterrows():
-            insert_price(
-                ticker=t,
-                new_price=float(row["price"]),
-                volume=int((row.get("volume") or 0)),
-                timestamp=ts.to_pydatetime()
-            )
-            count += 1
-        total_inserted += count
-        print(f"[ingest] {t}: wrote {count} hourly bars")
+        total_inserted += fetch_and_store_ticker(t)
     print(f"[ingest] total={total_inserted}")
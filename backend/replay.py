@@ -0,0 +1,276 @@
+# replay.py
+"""
+Offline replay / load test for ingest → compute → emit → alert.
+
+Feeds synthetic (or recorded CSV) hourly bars through fetch_and_store_all via
+a fake market-data source, runs run_for_all_tickers against the configured
+Postgres (point DB_* at a local instance!) and sends alerts to a local
+webhook sink instead of Discord. Reports throughput, per-stage latency and
+DB load per replayed bar.
+
+  python replay.py --tickers 1000 --steps 5 --speedup 3600
+  python replay.py --csv-dir ./bars --steps 24 --speedup 0
+
+CSV files are named <TICKER>.csv with columns timestamp,close[,volume];
+recorded series are shifted so their last bar lands on the current hour.
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+import config
+import db_query
+import price_fetcher
+import signals_engine
+
+_PERIOD_BARS = {"1d": 24, "7d": 24 * 7, "30d": 24 * 30}
+
+
+# ====== FAKE MARKET DATA ======
+class ReplaySource:
+    """Serves each ticker's bars up to the current replay cursor, yfinance-shaped."""
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], visible: int):
+        self.frames = frames
+        self.visible = visible   # number of bars released so far
+
+    def advance(self):
+        self.visible += 1
+
+    def __call__(self, ticker: str, period: str, interval: str) -> pd.DataFrame:
+        df = self.frames.get(ticker)
+        if df is None:
+            return pd.DataFrame()
+        end = min(self.visible, len(df))
+        start = max(0, end - _PERIOD_BARS.get(period, 24))
+        return df.iloc[start:end]
+
+
+def synthetic_frames(tickers: List[str], n_bars: int, seed: int = 42) -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    idx = pd.date_range(end=end, periods=n_bars, freq="h", tz="UTC")
+    frames = {}
+    for t in tickers:
+        base = rng.uniform(5, 500)
+        close = base * np.exp(np.cumsum(rng.normal(0, 0.01, n_bars)))
+        vol = rng.integers(1_000, 1_000_000, n_bars)
+        frames[t] = pd.DataFrame({"Close": close, "Volume": vol}, index=idx)
+    return frames
+
+
+def csv_frames(csv_dir: str) -> Dict[str, pd.DataFrame]:
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    frames = {}
+    for name in sorted(os.listdir(csv_dir)):
+        if not name.endswith(".csv"):
+            continue
+        df = pd.read_csv(os.path.join(csv_dir, name))
+        ts = pd.to_datetime(df["timestamp"], utc=True)
+        df = pd.DataFrame({
+            "Close": pd.to_numeric(df["close"], errors="coerce"),
+            "Volume": df["volume"] if "volume" in df.columns else 0,
+        }).set_index(ts).dropna(subset=["Close"]).sort_index()
+        df.index = df.index + (pd.Timestamp(now) - df.index[-1])
+        frames[name[:-4]] = df
+    return frames
+
+
+# ====== WEBHOOK SINK ======
+class _Sink(BaseHTTPRequestHandler):
+    received: List[float] = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with _Sink.lock:
+            _Sink.received.append(time.monotonic())
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_sink(port: int) -> ThreadingHTTPServer:
+    srv = ThreadingHTTPServer(("127.0.0.1", port), _Sink)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+# ====== MEASUREMENT ======
+class StageTimer:
+    """
+    Wraps a module function and records per-call wall time. Time spent inside the
+    `exclude` timers during a call is subtracted, so a stage can be reported net of
+    the stages nested in it (the replay runs tickers sequentially on one thread).
+    """
+
+    def __init__(self, module, name: str, exclude: tuple = ()):
+        self.module, self.name = module, name
+        self.fn = getattr(module, name)
+        self.exclude = exclude
+        self.samples: List[float] = []
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def _nested(self) -> float:
+        return sum(t.total for t in self.exclude)
+
+    def __enter__(self):
+        def timed(*a, **kw):
+            nested0 = self._nested()
+            t0 = time.perf_counter()
+            try:
+                return self.fn(*a, **kw)
+            finally:
+                dt = time.perf_counter() - t0
+                net = dt - (self._nested() - nested0)
+                with self._lock:
+                    self.total += dt
+                    self.samples.append(net)
+        setattr(self.module, self.name, timed)
+        return self
+
+    def __exit__(self, *exc):
+        setattr(self.module, self.name, self.fn)
+
+    def drain(self) -> List[float]:
+        with self._lock:
+            out, self.samples = self.samples, []
+        return out
+
+
+def _pct(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    a = np.asarray(samples) * 1000
+    return {"n": len(a), "p50_ms": round(float(np.percentile(a, 50)), 1),
+            "p95_ms": round(float(np.percentile(a, 95)), 1), "max_ms": round(float(a.max()), 1)}
+
+
+def _conn():
+    return db_query.connect()
+
+
+def db_stats() -> Dict[str, int]:
+    with _conn() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT xact_commit, tup_inserted, tup_updated, tup_deleted, tup_fetched, blks_read, blks_hit
+            FROM pg_stat_database WHERE datname = current_database()
+        """)
+        row = cur.fetchone()
+    keys = ["xact_commit", "tup_inserted", "tup_updated", "tup_deleted", "tup_fetched", "blks_read", "blks_hit"]
+    return dict(zip(keys, row))
+
+
+def seed_history(source: ReplaySource):
+    """Bulk-load the warm-up bars so indicators have history before the replay starts."""
+    rows = []
+    for t, df in source.frames.items():
+        part = df.iloc[:source.visible]
+        rows.extend((t, float(c), int(v), ts.to_pydatetime()) for ts, c, v in zip(part.index, part["Close"], part["Volume"]))
+    with _conn() as conn, conn.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO prices (ticker, price, volume, timestamp) VALUES %s
+            ON CONFLICT (ticker, timestamp) DO NOTHING
+        """, rows, page_size=5000)
+    print(f"[replay] seeded {len(rows)} warm-up bars")
+
+
+# ====== DRIVER ======
+def run(args) -> Dict[str, object]:
+    if args.csv_dir:
+        frames = csv_frames(args.csv_dir)
+    else:
+        frames = synthetic_frames([f"SYN{i:04d}" for i in range(args.tickers)], args.warmup + args.steps)
+    tickers = list(frames)
+    source = ReplaySource(frames, visible=args.warmup)
+
+    sink = start_sink(args.sink_port)
+    price_fetcher.set_history_source(source)
+    price_fetcher.TICKERS[:] = tickers
+    signals_engine.WEBHOOK_URL = f"http://127.0.0.1:{args.sink_port}/webhook"
+    signals_engine.ENABLE_ALERTS = True
+
+    if args.warmup:
+        seed_history(source)
+
+    steps = []
+    step_sec = (config.BAR_INTERVAL_MIN * 60 / args.speedup) if args.speedup > 0 else 0.0
+    try:
+        with StageTimer(price_fetcher, "fetch_and_store_ticker") as t_ingest, \
+             StageTimer(signals_engine, "_emit") as t_emit, \
+             StageTimer(signals_engine, "send_alert") as t_alert, \
+             StageTimer(signals_engine, "run_for_ticker", exclude=(t_emit, t_alert)) as t_compute:
+            for step in range(args.steps):
+                t_start = time.perf_counter()
+                source.advance()
+                db0, alerts0 = db_stats(), len(_Sink.received)
+
+                t0 = time.perf_counter()
+                price_fetcher.fetch_and_store_all()
+                t1 = time.perf_counter()
+                summary = signals_engine.run_for_all_tickers(tickers, triggered_by="replay")
+                t2 = time.perf_counter()
+
+                db1 = db_stats()
+                rec = {
+                    "step": step,
+                    "ingest_sec": round(t1 - t0, 3),
+                    "compute_sec": round(t2 - t1, 3),
+                    "tickers_per_sec": round(len(tickers) / max(t2 - t0, 1e-9), 1),
+                    "ingest": _pct(t_ingest.drain()),
+                    "compute": _pct(t_compute.drain()),   # per ticker, net of emit + alert
+                    "emit": _pct(t_emit.drain()),
+                    "alert": _pct(t_alert.drain()),
+                    "alerts_received": len(_Sink.received) - alerts0,
+                    "signals": {k: summary.get(k, 0) for k in ("computed", "skipped", "written", "total_emitted")},
+                    "db": {k: db1[k] - db0[k] for k in db1},
+                }
+                steps.append(rec)
+                print(f"[replay] {rec}")
+
+                wait = step_sec - (time.perf_counter() - t_start)
+                if wait > 0:
+                    time.sleep(wait)
+    finally:
+        price_fetcher.set_history_source(None)
+        sink.shutdown()
+
+    total_ingest = sum(s["ingest_sec"] for s in steps)
+    total_compute = sum(s["compute_sec"] for s in steps)
+    report = {
+        "tickers": len(tickers),
+        "steps": len(steps),
+        "ingest_sec_total": round(total_ingest, 2),
+        "compute_sec_total": round(total_compute, 2),
+        "tickers_per_sec": round(len(tickers) * len(steps) / max(total_ingest + total_compute, 1e-9), 1),
+        "bottleneck": "ingest" if total_ingest >= total_compute else "compute",
+        "alerts_received": len(_Sink.received),
+    }
+    print(f"[replay] report {report}")
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline pipeline replay / load test")
+    ap.add_argument("--tickers", type=int, default=1000, help="synthetic ticker count (ignored with --csv-dir)")
+    ap.add_argument("--csv-dir", help="directory of recorded <TICKER>.csv bars")
+    ap.add_argument("--warmup", type=int, default=250, help="bars bulk-loaded before the replay (MA200 needs 200)")
+    ap.add_argument("--steps", type=int, default=5, help="bars to replay through the full pipeline")
+    ap.add_argument("--speedup", type=float, default=0, help="x real time per bar; 0 = as fast as possible")
+    ap.add_argument("--sink-port", type=int, default=8765)
+    run(ap.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# scheduler.py
+"""
+Long-running ingestion loop (alternative to the Lambda cron).
+
+Wakes at each bar close, staggers provider calls through a token bucket and
+hands every ticker to the signal engine as soon as its bars are stored.
+Counters and bar-close → signal lag are served as JSON on
+GET http://<host>:SCHED_METRICS_PORT/metrics.
+Run with:  python scheduler.py
+"""
+import json
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+import config
+import price_fetcher
+from price_fetcher import TICKERS, FetchAborted, fetch_and_store_ticker
+from signals_engine import run_for_ticker
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/sec, at most `capacity` banked."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+def next_bar_close(now: datetime, interval_min: int = config.BAR_INTERVAL_MIN) -> datetime:
+    """First bar boundary strictly after `now` (UTC, aligned to the epoch)."""
+    step = interval_min * 60
+    epoch = int(now.timestamp())
+    return datetime.fromtimestamp((epoch // step + 1) * step, tz=timezone.utc)
+
+
+class Scheduler:
+    def __init__(self, tickers: List[str], *,
+                 rate_per_sec: float = config.SCHED_RATE_PER_SEC,
+                 burst: int = config.SCHED_BURST,
+                 fetch_workers: int = config.SCHED_FETCH_WORKERS,
+                 compute_workers: int = config.SCHED_COMPUTE_WORKERS,
+                 close_delay_sec: float = config.SCHED_CLOSE_DELAY_SEC):
+        self.tickers = tickers
+        self.close_delay = timedelta(seconds=close_delay_sec)
+        self.bucket = TokenBucket(rate_per_sec, burst)
+        self.stop = threading.Event()
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="fetch")
+        self._compute_pool = ThreadPoolExecutor(max_workers=compute_workers, thread_name_prefix="compute")
+        self._lock = threading.Lock()
+        self._lags: deque = deque(maxlen=1000)   # seconds from bar close → signals written
+        self._counts = {"bars": 0, "fetched": 0, "computed": 0, "skipped": 0, "emitted": 0, "errors": 0}
+
+    # --- metrics ---
+    def _record(self, key: str, n: int = 1):
+        with self._lock:
+            self._counts[key] += n
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            last = self._lags[-1] if self._lags else None
+            lags = sorted(self._lags)
+            out: Dict[str, Any] = dict(self._counts)
+        if lags:
+            out["lag_sec"] = {
+                "last": round(last, 3),
+                "p50": round(lags[len(lags) // 2], 3),
+                "p95": round(lags[min(len(lags) - 1, int(len(lags) * 0.95))], 3),
+                "max": round(lags[-1], 3),
+            }
+        return out
+
+    # --- pipeline stages ---
+    def _compute(self, ticker: str, bar_close: datetime):
+        try:
+            res = run_for_ticker(ticker, triggered_by="auto", skip_unchanged=True)
+            if res.get("skipped"):
+                self._record("skipped")
+                return
+            lag = (datetime.now(timezone.utc) - bar_close).total_seconds()
+            with self._lock:
+                self._lags.append(lag)
+                self._counts["computed"] += 1
+                self._counts["emitted"] += res.get("emitted", 0)
+            print(f"[sched] {ticker} signals emitted={res.get('emitted', 0)} lag={lag:.1f}s")
+        except Exception as e:
+            self._record("errors")
+            print(f"[sched] compute error {ticker}: {e}")
+
+    def _fetch(self, ticker: str, bar_close: datetime):
+        # tokens are taken per provider call (retries included) via price_fetcher's call gate
+        try:
+            # the hour that opened at bar_close has ~close_delay of data; store only closed bars
+            fetch_and_store_ticker(ticker, before=bar_close)
+            self._record("fetched")
+        except FetchAborted:
+            return
+        except Exception as e:
+            self._record("errors")
+            print(f"[sched] fetch error {ticker}: {e}")
+            return
+        # no batch barrier: this ticker computes while the rest are still fetching
+        if not self.stop.is_set():
+            self._compute_pool.submit(self._compute, ticker, bar_close)
+
+    def run_bar(self, bar_close: datetime):
+        self._record("bars")
+        print(f"[sched] bar close {bar_close.isoformat()} → {len(self.tickers)} tickers")
+        for t in self.tickers:
+            self._fetch_pool.submit(self._fetch, t, bar_close)
+
+    def serve_metrics(self, port: int = config.SCHED_METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+        if port <= 0:
+            return None
+        sched = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = json.dumps(sched.metrics()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+        threading.Thread(target=server.serve_forever, name="sched-metrics", daemon=True).start()
+        print(f"[sched] metrics on :{port}/metrics")
+        return server
+
+    def run_forever(self):
+        print(f"[sched] start tickers={len(self.tickers)} interval={config.BAR_INTERVAL_MIN}m")
+        price_fetcher.set_call_gate(lambda: not self.stop.is_set() and self.bucket.acquire(self.stop))
+        server = self.serve_metrics()
+        while not self.stop.is_set():
+            bar_close = next_bar_close(datetime.now(timezone.utc))
+            wake = bar_close + self.close_delay
+            if self.stop.wait(max(0.0, (wake - datetime.now(timezone.utc)).total_seconds())):
+                break
+            self.run_bar(bar_close)
+            print(f"[sched] metrics {self.metrics()}")
+        self.shutdown()
+        price_fetcher.set_call_gate(None)
+        if server is not None:
+            server.shutdown()
+
+    def shutdown(self):
+        self.stop.set()
+        print("[sched] shutting down, draining in-flight work...")
+        self._fetch_pool.shutdown(wait=True, cancel_futures=True)
+        self._compute_pool.shutdown(wait=True)
+        print(f"[sched] stopped metrics={self.metrics()}")
+
+
+def main():
+    sched = Scheduler(TICKERS)
+
+    def _handle(signum, _frame):
+        print(f"[sched] signal {signum} received")
+        sched.stop.set()
+
+    signal.signal(signal.SIGTERM, _handle)
+    signal.signal(signal.SIGINT, _handle)
+    sched.run_forever()
+
+
+if __name__ == "__main__":
+    main()
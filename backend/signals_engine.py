@@ -1,14 +1,16 @@
 import os
+import sys
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List, Optional
 
+import numpy as np
 import pandas as pd
-import psycopg2
 
 from plot_prices import fetch_price_history
-from db_insert import insert_signal
+from db_insert import insert_signal, mark_ticker_processed
 from alert import send_alert
 import config
+import db_query
 
 # ====== ENV / CONSTANTS ======
 WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL") or config.DISCORD_WEBHOOK
@@ -22,6 +24,7 @@ THRESHOLD_POSTURE = config.THRESHOLD_POSTURE
 
 INCLUDE_SIGNALS = config.INCLUDE_SIGNALS
 ENABLE_REGIME_FILTER = config.ENABLE_REGIME_FILTER
+INDICATOR_BACKEND = config.INDICATOR_BACKEND
 
 # ====== BACKCOMPAT ADAPTER ======
 def insert_generated_signal(
@@ -118,12 +121,28 @@ def _daily_open_and_last_from_df(data: pd.DataFrame, market_tz: str = MARKET_TZ)
     last_price = float(day_slice['close'].iloc[-1])
     return open_price, last_price
 
+# ====== INDICATOR BACKEND ======
+def set_indicator_backend(name: str):
+    """'pandas' (calculate_* above) or 'numpy' (indicators_np kernels)."""
+    global INDICATOR_BACKEND
+    if name not in ("pandas", "numpy"):
+        raise ValueError(f"unknown indicator backend: {name}")
+    INDICATOR_BACKEND = name
+
+def _backend():
+    if INDICATOR_BACKEND == "numpy":
+        import indicators_np
+        return indicators_np
+    return sys.modules[__name__]
+
 # ====== SIGNAL WRAPPERS ======
+# Wrappers read indicator outputs positionally via np.asarray so either backend works.
 def signal_macd_crossover(ticker: str, data: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9):
-    macd_line, sig_line, _ = calculate_macd(data, fast, slow, signal)
+    macd_line, sig_line, _ = _backend().calculate_macd(data, fast, slow, signal)
+    macd_line, sig_line = np.asarray(macd_line), np.asarray(sig_line)
     if len(macd_line) < 2: return None
-    prev = macd_line.iloc[-2] - sig_line.iloc[-2]
-    curr = macd_line.iloc[-1] - sig_line.iloc[-1]
+    prev = macd_line[-2] - sig_line[-2]
+    curr = macd_line[-1] - sig_line[-1]
     if pd.isna(prev) or pd.isna(curr): return None
     if (prev <= 0) and (curr > 0):
         action, strength = "BUY", "medium"
@@ -141,9 +160,9 @@ def signal_macd_crossover(ticker: str, data: pd.DataFrame, fast: int = 12, slow:
     }
 
 def signal_bollinger_mean_revert(ticker: str, data: pd.DataFrame, window: int = 20, k: float = 2.0):
-    sma, ub, lb = calculate_bollinger(data, window=window, k=k)
+    sma, ub, lb = _backend().calculate_bollinger(data, window=window, k=k)
     close = data['close'].iloc[-1]
-    sma_last, ub_last, lb_last = sma.iloc[-1], ub.iloc[-1], lb.iloc[-1]
+    sma_last, ub_last, lb_last = np.asarray(sma)[-1], np.asarray(ub)[-1], np.asarray(lb)[-1]
     if pd.isna(sma_last) or pd.isna(ub_last) or pd.isna(lb_last): return None
     std = (ub_last - sma_last) / k if k != 0 else None
     z = (close - sma_last) / std if (std and std != 0) else None
@@ -163,12 +182,12 @@ def signal_bollinger_mean_revert(ticker: str, data: pd.DataFrame, window: int =
     }
 
 def signal_ma_cross(ticker: str, data: pd.DataFrame, short: int = 50, long: int = 200):
-    short_ma, long_ma, cross_up, cross_down = calculate_ma_cross(data, short=short, long=long)
-    sm, lm = short_ma.iloc[-1], long_ma.iloc[-1]
+    short_ma, long_ma, cross_up, cross_down = _backend().calculate_ma_cross(data, short=short, long=long)
+    sm, lm = np.asarray(short_ma)[-1], np.asarray(long_ma)[-1]
     if pd.isna(sm) or pd.isna(lm): return None
     ratio_minus_1 = (sm / lm) - 1 if lm != 0 else None
-    if bool(cross_up.iloc[-1]):   action, strength = "BUY", "high"
-    elif bool(cross_down.iloc[-1]): action, strength = "SELL", "high"
+    if bool(np.asarray(cross_up)[-1]):   action, strength = "BUY", "high"
+    elif bool(np.asarray(cross_down)[-1]): action, strength = "SELL", "high"
     else: action, strength = "NEUTRAL", "low"
     return {
         "ticker": ticker, "signal_type": "MA_CROSS",
@@ -180,8 +199,8 @@ def signal_ma_cross(ticker: str, data: pd.DataFrame, short: int = 50, long: int
     }
 
 def signal_rsi_wilder(ticker: str, data: pd.DataFrame, period: int = 14, overbought: float = 70.0, oversold: float = 30.0):
-    rsi = calculate_rsi(data['close'], period=period)
-    val = rsi.iloc[-1]
+    rsi = _backend().calculate_rsi(data['close'], period=period)
+    val = np.asarray(rsi)[-1]
     if pd.isna(val): return None
     if val > overbought:   action, strength = "SELL", "medium" if val < 80 else "high"
     elif val < oversold:   action, strength = "BUY", "medium" if val > 20 else "high"
@@ -218,9 +237,10 @@ def signal_daily_open_threshold(ticker: str, data: pd.DataFrame, pct: float = TH
     }
 
 # ====== EMIT / ALERT HELPERS ======
-def _emit(payload: Dict[str, Any], *, triggered_by: str = "manual", timestamp: Optional[datetime] = None, bar_ts: Optional[datetime] = None) -> bool:
+def _emit(payload: Dict[str, Any], *, triggered_by: str = "manual", timestamp: Optional[datetime] = None, bar_ts: Optional[datetime] = None) -> Optional[bool]:
+    """True = row written, False = identical row already stored, None = failed."""
     try:
-        insert_signal(
+        return insert_signal(
             ticker=payload["ticker"],
             signal_type=payload["signal_type"],
             strategy=payload.get("strategy"),
@@ -234,24 +254,21 @@ def _emit(payload: Dict[str, Any], *, triggered_by: str = "manual", timestamp: O
             timestamp=timestamp,   # human-facing time
             bar_ts=bar_ts or timestamp
         )
-        return True
     except Exception as e:
         print(f"_emit insert failed: {e}")
-        return False
+        return None
 
 def _last_similar_signal_time(ticker: str, signal_type: str, action: str) -> Optional[datetime]:
     conn = cur = None
     try:
-        conn = psycopg2.connect(
-            dbname=config.DB_NAME, user=config.DB_USER, password=config.DB_PASSWORD,
-            host=config.DB_HOST, port=config.DB_PORT
-        )
+        conn = db_query.connect()
         cur = conn.cursor()
         cur.execute("""
             SELECT timestamp FROM signals
             WHERE ticker=%s AND signal_type=%s AND action=%s
+              AND position(%s in COALESCE(strategy, '')) = 0   -- hourly rows only
             ORDER BY timestamp DESC LIMIT 1;
-        """, (ticker, signal_type, action))
+        """, (ticker, signal_type, action, config.INTRADAY_TAG))
         row = cur.fetchone()
         return row[0] if row else None
     except Exception as e:
@@ -266,6 +283,32 @@ def _should_alert(ticker: str, signal_type: str, action: str, cooldown_min: int
     if not ts: return True
     return (datetime.now(timezone.utc) - ts) >= timedelta(minutes=cooldown_min)
 
+def _bar_state(tickers: List[str]) -> Dict[str, tuple]:
+    """{ticker: (latest prices bar, last bar_ts the engine processed)}; {} on error."""
+    conn = cur = None
+    try:
+        conn = db_query.connect()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT t.ticker,
+                   (SELECT MAX(p.timestamp) FROM prices p WHERE p.ticker = t.ticker),
+                   r.last_bar_ts
+            FROM unnest(%s::text[]) AS t(ticker)
+            LEFT JOIN signal_runs r ON r.ticker = t.ticker;
+        """, (list(tickers),))
+        return {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+    except Exception as e:
+        print(f"_bar_state error: {e}")
+        return {}
+    finally:
+        if cur: cur.close()
+        if conn: conn.close()
+
+def _is_unchanged(state: Optional[tuple]) -> bool:
+    if not state: return False
+    latest, processed = state
+    return latest is not None and processed is not None and latest <= processed
+
 # ====== DATA LOADER ======
 def _load_prices(ticker: str, lookback_bars: int = LOOKBACK_BARS) -> Optional[pd.DataFrame]:
     df = fetch_price_history(ticker)  # columns: ['timestamp','price']
@@ -300,13 +343,7 @@ def _apply_regime_gate(payload: Dict[str, Any], data: pd.DataFrame) -> Dict[str,
         payload["strength"] = "low"
     return payload
 
-def run_for_ticker(ticker: str, *, triggered_by: str = "manual") -> Dict[str, Any]:
-    data = _load_prices(ticker, lookback_bars=LOOKBACK_BARS)
-    if data is None:
-        return {"ticker": ticker, "emitted": 0, "errors": ["no_data"]}
-
-    bar_ts: Optional[datetime] = data.index[-1].to_pydatetime() if len(data.index) else None
-
+def _registry() -> List[tuple]:
     registry: List[tuple] = [
         ("THRESHOLD", signal_daily_open_threshold, {"pct": THRESHOLD_PCT, "market_tz": MARKET_TZ, "posture": THRESHOLD_POSTURE}),
         ("MACD",      signal_macd_crossover,       {}),
@@ -317,11 +354,13 @@ def run_for_ticker(ticker: str, *, triggered_by: str = "manual") -> Dict[str, An
     if INCLUDE_SIGNALS:
         allowed = set(INCLUDE_SIGNALS)
         registry = [m for m in registry if m[0] in allowed]
+    return registry
 
-    emitted: List[Dict[str, Any]] = []
+def compute_signals(ticker: str, data: pd.DataFrame) -> tuple:
+    """Run every registered strategy on `data` (no I/O). Returns ([(name, payload)], errors)."""
+    payloads: List[tuple] = []
     errors: List[str] = []
-
-    for name, fn, kwargs in registry:
+    for name, fn, kwargs in _registry():
         try:
             payload = fn(ticker, data, **kwargs)
         except Exception as e:
@@ -329,10 +368,25 @@ def run_for_ticker(ticker: str, *, triggered_by: str = "manual") -> Dict[str, An
             continue
         if not payload:
             continue
-
         # light filter
-        payload = _apply_regime_gate(payload, data)
+        payloads.append((name, _apply_regime_gate(payload, data)))
+    return payloads, errors
+
+def run_for_ticker(ticker: str, *, triggered_by: str = "manual", skip_unchanged: bool = False) -> Dict[str, Any]:
+    if skip_unchanged and _is_unchanged(_bar_state([ticker]).get(ticker)):
+        return {"ticker": ticker, "emitted": 0, "written": 0, "skipped": True, "errors": []}
 
+    data = _load_prices(ticker, lookback_bars=LOOKBACK_BARS)
+    if data is None:
+        return {"ticker": ticker, "emitted": 0, "errors": ["no_data"]}
+
+    bar_ts: Optional[datetime] = data.index[-1].to_pydatetime() if len(data.index) else None
+
+    payloads, errors = compute_signals(ticker, data)
+    emitted: List[Dict[str, Any]] = []
+    written = 0
+
+    for name, payload in payloads:
         # Decide if we will alert (check BEFORE insert so we don't see the row we are about to write)
         will_alert = (
             ENABLE_ALERTS and WEBHOOK_URL and payload["action"] in ("BUY", "SELL")
@@ -342,10 +396,13 @@ def run_for_ticker(ticker: str, *, triggered_by: str = "manual") -> Dict[str, An
               f"enable={ENABLE_ALERTS} webhook={'set' if WEBHOOK_URL else 'missing'} "
               f"cooldownMin={ALERT_COOLDOWN_MIN} will_send={will_alert}")
 
-        # Insert first; only alert if insert succeeds
-        if _emit(payload, triggered_by=triggered_by, timestamp=bar_ts, bar_ts=bar_ts):
+        # Insert first; only alert if the row actually changed
+        res = _emit(payload, triggered_by=triggered_by, timestamp=bar_ts, bar_ts=bar_ts)
+        if res is not None:
             emitted.append(payload)
-            if will_alert:
+            if res:
+                written += 1
+            if will_alert and res:
                 try:
                     send_alert(payload.get("message") or f"{payload['ticker']} {payload['signal_type']} → {payload['action']}", WEBHOOK_URL)
                 except Exception as e:
@@ -353,14 +410,28 @@ def run_for_ticker(ticker: str, *, triggered_by: str = "manual") -> Dict[str, An
         else:
             errors.append(f"emit:{name}")
 
-    return {"ticker": ticker, "emitted": len(emitted), "last_actions": {p["signal_type"]: p["action"] for p in emitted}, "errors": errors}
+    # advance the watermark only when every strategy's row landed, so emit/compute
+    # failures are retried next run. Alerts stay best-effort: a retry would find the
+    # row unchanged and not re-send, so alert errors don't hold the watermark back.
+    if bar_ts is not None and all(e.startswith("alert:") for e in errors):
+        mark_ticker_processed(ticker, bar_ts)
 
-def run_for_all_tickers(tickers: List[str], *, triggered_by: str = "auto") -> Dict[str, Any]:
-    summary: Dict[str, Any] = {"total_emitted": 0, "per_ticker": {}, "errors": {}}
+    return {"ticker": ticker, "emitted": len(emitted), "written": written, "last_actions": {p["signal_type"]: p["action"] for p in emitted}, "errors": errors}
+
+def run_for_all_tickers(tickers: List[str], *, triggered_by: str = "auto", skip_unchanged: bool = True) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"total_emitted": 0, "skipped": 0, "computed": 0, "written": 0, "per_ticker": {}, "errors": {}}
+    state = _bar_state(tickers) if skip_unchanged else {}
     for t in tickers:
+        if _is_unchanged(state.get(t)):
+            summary["skipped"] += 1
+            summary["per_ticker"][t] = {"ticker": t, "emitted": 0, "written": 0, "skipped": True, "errors": []}
+            continue
         res = run_for_ticker(t, triggered_by=triggered_by)
         summary["per_ticker"][t] = res
+        summary["computed"] += 1
         summary["total_emitted"] += res.get("emitted", 0)
+        summary["written"] += res.get("written", 0)
         if res.get("errors"):
             summary["errors"][t] = res["errors"]
+    print(f"[engine] computed={summary['computed']} skipped={summary['skipped']} written={summary['written']}")
     return summary
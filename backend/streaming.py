@@ -0,0 +1,440 @@
+# streaming.py
+"""
+Streaming intraday mode: evaluate signals the moment each bar closes.
+
+A feed (pluggable) yields Bar or Tick events. Ticks are rolled into
+STREAM_BAR_SEC bars by TickAggregator, using event time as the clock; for live
+feeds a wall-clock timer also closes due bars while the feed is quiet. Every
+closed bar goes into a per-ticker rolling buffer (LOOKBACK_BARS deep) and
+runs through signals_engine.compute_signals in memory. Signal rows, and bars
+when they are hourly (or --persist-bars), are written by a background micro-batch
+writer, so the hot path never waits on Postgres. Alerts use an in-memory
+cooldown and go out on their own threads. bar_to_signal / bar_to_db are
+measured from each bar's close on the wall clock (for a replay, from its
+scheduled close; see ReplayFeed).
+
+  python streaming.py --synthetic 300 --bar-sec 60 --speedup 600
+  python streaming.py --csv-dir ./bars --speedup 0
+  python streaming.py --source my_feed:stream --tickers AAPL,MSFT
+
+A pluggable source is "module:callable" taking the ticker list and returning
+an iterable of Bar / Tick. Set INDICATOR_BACKEND=numpy for the lowest latency.
+"""
+import argparse
+import importlib
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, Any, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+import db_query
+import signals_engine
+from alert import send_alert
+from db_insert import insert_prices_batch, insert_signals_batch
+
+
+HOURLY_BAR_SEC = 3600
+
+
+class Bar(NamedTuple):
+    ticker: str
+    ts: datetime        # bar close time (UTC)
+    close: float
+    volume: int = 0
+
+
+class Tick(NamedTuple):
+    ticker: str
+    ts: datetime
+    price: float
+    size: int = 0
+
+
+# ====== FEEDS ======
+class ReplayFeed:
+    """
+    Local stand-in for a live feed: merges per-ticker frames (index = bar close,
+    columns close[/volume]) into one time-ordered Bar stream. speedup=0 replays
+    as fast as possible, otherwise bar timestamps are paced at `speedup`× real time.
+    Replayed timestamps aren't wall time, so closed_at() maps a bar close onto the
+    wall clock for latency accounting: its scheduled due time when paced, else the
+    moment the first bar with that timestamp was released. Every ticker sharing a
+    close is measured from the same instant, so queueing behind them is included.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], speedup: float = 0.0):
+        self.frames = frames
+        self.speedup = speedup
+        self._close_ts: Optional[datetime] = None
+        self._close_wall = 0.0
+
+    def closed_at(self, bar: "Bar") -> float:
+        return self._close_wall if bar.ts == self._close_ts else time.time()
+
+    def __iter__(self) -> Iterator[Bar]:
+        events = []
+        for t, df in self.frames.items():
+            vol = df["volume"] if "volume" in df.columns else pd.Series(0, index=df.index)
+            events.extend(zip(df.index, [t] * len(df), df["close"].to_numpy(), vol.to_numpy()))
+        events.sort(key=lambda e: e[0])
+
+        t0_mono, t0_wall = time.monotonic(), time.time()
+        t0_feed = events[0][0].to_pydatetime() if events else None
+        for ts, t, close, vol in events:
+            ts = ts.to_pydatetime()
+            if ts != self._close_ts:
+                if self.speedup > 0:
+                    offset = (ts - t0_feed).total_seconds() / self.speedup
+                    delay = t0_mono + offset - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    self._close_wall = t0_wall + offset
+                else:
+                    self._close_wall = time.time()
+                self._close_ts = ts
+            yield Bar(t, ts, float(close), int(vol))
+
+
+def synthetic_frames(tickers: List[str], n_bars: int, bar_sec: int, seed: int = 7) -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    idx = pd.date_range(end=end, periods=n_bars, freq=f"{bar_sec}s", tz="UTC")
+    return {
+        t: pd.DataFrame({
+            "close": rng.uniform(5, 500) * np.exp(np.cumsum(rng.normal(0, 0.002, n_bars))),
+            "volume": rng.integers(100, 10_000, n_bars),
+        }, index=idx)
+        for t in tickers
+    }
+
+
+def csv_frames(csv_dir: str) -> Dict[str, pd.DataFrame]:
+    frames = {}
+    for name in sorted(os.listdir(csv_dir)):
+        if name.endswith(".csv"):
+            df = pd.read_csv(os.path.join(csv_dir, name))
+            df.index = pd.to_datetime(df.pop("timestamp"), utc=True)
+            frames[name[:-4]] = df.sort_index()
+    return frames
+
+
+def load_source(spec: str):
+    mod, _, fn = spec.partition(":")
+    return getattr(importlib.import_module(mod), fn or "stream")
+
+
+# ====== TICKS → BARS ======
+class TickAggregator:
+    """
+    Rolls ticks into fixed bars. A bar stays open until the event clock (latest
+    tick time seen, or the `now` passed to flush_due) passes its end + grace, so
+    late ticks land in the bar they belong to; ticks for a bar already emitted
+    are dropped and counted. A later bar is never touched by an earlier tick.
+    """
+
+    def __init__(self, bar_sec: int = config.STREAM_BAR_SEC, grace_sec: float = config.STREAM_GRACE_SEC):
+        self.bar = timedelta(seconds=bar_sec)
+        self.grace = timedelta(seconds=grace_sec)
+        self._open: Dict[str, Dict[datetime, list]] = {}   # ticker -> {bar_end: [close, volume, last tick ts]}
+        self._emitted: Dict[str, datetime] = {}            # ticker -> end of the last bar emitted
+        self._clock: Optional[datetime] = None
+        self.late_dropped = 0
+
+    def _bar_end(self, ts: datetime) -> datetime:
+        step = int(self.bar.total_seconds())
+        return datetime.fromtimestamp((int(ts.timestamp()) // step + 1) * step, tz=timezone.utc)
+
+    def add(self, tick: Tick) -> List[Bar]:
+        end = self._bar_end(tick.ts)
+        done = self._emitted.get(tick.ticker)
+        if done is not None and end <= done:
+            self.late_dropped += 1
+        else:
+            bars = self._open.setdefault(tick.ticker, {})
+            cur = bars.get(end)
+            if cur is None:
+                bars[end] = [tick.price, tick.size, tick.ts]
+            else:
+                if tick.ts >= cur[2]:   # close = last tick by event time, not arrival order
+                    cur[0], cur[2] = tick.price, tick.ts
+                cur[1] += tick.size
+        if self._clock is None or tick.ts > self._clock:
+            self._clock = tick.ts
+        return self.flush_due()
+
+    def flush_due(self, now: Optional[datetime] = None) -> List[Bar]:
+        if now is not None and (self._clock is None or now > self._clock):
+            self._clock = now
+        if self._clock is None:
+            return []
+        closed = []
+        for t, bars in list(self._open.items()):
+            for end in sorted(bars):
+                if end + self.grace > self._clock:
+                    break
+                close, vol, _ = bars.pop(end)
+                closed.append(Bar(t, end, close, vol))
+                self._emitted[t] = end
+            if not bars:
+                del self._open[t]
+        return closed
+
+
+# ====== MICRO-BATCH WRITER ======
+class BatchWriter(threading.Thread):
+    """Drains bars/signals from a queue and writes them every STREAM_FLUSH_MS (or FLUSH_ROWS)."""
+
+    def __init__(self, persist_bars: bool, flush_ms: int = config.STREAM_FLUSH_MS, flush_rows: int = config.STREAM_FLUSH_ROWS):
+        super().__init__(name="stream-writer", daemon=True)
+        self.q: queue.Queue = queue.Queue()
+        self.persist_bars = persist_bars
+        self.flush_sec = flush_ms / 1000.0
+        self.flush_rows = flush_rows
+        self._stopping = threading.Event()
+        self.flushes = 0
+        self.rows_written = 0
+        self.dropped = 0     # queued rows lost to failed flushes
+        self.persist_lat: deque = deque(maxlen=5000)   # bar close (wall clock) → row committed (sec)
+
+    def put(self, kind: str, row, closed_at: float):
+        self.q.put((kind, row, closed_at))
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        conn = None
+        while not (self._stopping.is_set() and self.q.empty()):
+            batch = []
+            deadline = time.monotonic() + self.flush_sec
+            while len(batch) < self.flush_rows:
+                try:
+                    batch.append(self.q.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if not batch:
+                continue
+            try:
+                if conn is None or conn.closed:
+                    conn = db_query.connect()
+                self._flush(conn, batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                print(f"[stream] flush failed ({len(batch)} rows dropped, {self.dropped} total): {e}")
+                try: conn.close()
+                except: pass
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    def _flush(self, conn, batch):
+        """One transaction per batch; the helpers raise on error so nothing is counted until commit."""
+        bars = [row for kind, row, _ in batch if kind == "bar"]
+        sigs = [row for kind, row, _ in batch if kind == "signal"]
+        n = 0
+        try:
+            with conn.cursor() as cur:
+                if bars and self.persist_bars:
+                    insert_prices_batch(bars, conn=conn, cursor=cur)
+                if sigs:
+                    n = insert_signals_batch(sigs, conn=conn, cursor=cur)
+            conn.commit()
+        except Exception:
+            try: conn.rollback()
+            except: pass
+            raise
+        done = time.time()
+        self.rows_written += n
+        self.persist_lat.extend(done - closed for kind, _, closed in batch if kind == "signal")
+        self.flushes += 1
+
+
+# ====== ENGINE ======
+class StreamEngine:
+    """
+    Latency is measured from each bar's close on the wall clock: bar.ts for a live
+    feed (so tick grace and aggregation delay are included), or `closed_at(bar)`
+    when the feed provides it (ReplayFeed). Bars are evaluated one at a time, so
+    the last ticker of a close also carries the time spent on the others. Live
+    feeds also get a wall-clock timer that closes due tick bars while the feed is quiet.
+    """
+
+    def __init__(self, *, lookback: int = config.LOOKBACK_BARS, persist_bars: Optional[bool] = config.STREAM_PERSIST_BARS,
+                 bar_sec: int = config.STREAM_BAR_SEC, closed_at: Optional[Callable[[Bar], float]] = None):
+        if persist_bars is None:
+            persist_bars = bar_sec == HOURLY_BAR_SEC
+        self.lookback = lookback
+        self.bar_sec = bar_sec
+        self.agg = TickAggregator(bar_sec=bar_sec)
+        self.buffers: Dict[str, deque] = {}
+        self.writer = BatchWriter(persist_bars)
+        self._alerts = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stream-alert")
+        self._last_alert: Dict[tuple, datetime] = {}
+        self.bars = 0
+        self.signals = 0
+        self.eval_lat: deque = deque(maxlen=5000)   # bar close (wall clock) → signals computed (sec)
+        self.stopped = threading.Event()
+        self.closed_at = closed_at or (lambda bar: bar.ts.timestamp())
+        self.live_clock = closed_at is None   # event time is wall time, so the flush timer may close bars
+        self._lock = threading.Lock()         # feed loop vs flush timer
+
+    def seed(self, tickers: List[str]):
+        """Prime buffers from `prices` (only meaningful when streaming hourly bars)."""
+        for t in tickers:
+            df = signals_engine._load_prices(t, lookback_bars=self.lookback)
+            if df is not None:
+                buf = self.buffers.setdefault(t, deque(maxlen=self.lookback))
+                buf.extend(zip(df.index.to_pydatetime(), df["close"].to_numpy()))
+        print(f"[stream] seeded {len(self.buffers)} tickers from prices")
+
+    def on_event(self, ev):
+        with self._lock:
+            if isinstance(ev, Tick):
+                for bar in self.agg.add(ev):
+                    self.on_bar(bar)
+            else:
+                self.on_bar(ev)
+
+    def _flush_timer(self, interval: float):
+        """Close tick bars on wall-clock time; otherwise a bar waits for the next tick."""
+        while not self.stopped.wait(interval):
+            with self._lock:
+                for bar in self.agg.flush_due(datetime.now(timezone.utc)):
+                    self.on_bar(bar)
+
+    def _tag(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Hourly bars share strategy with the batch engine; others carry their bar size."""
+        if self.bar_sec == HOURLY_BAR_SEC:
+            return payload
+        return {**payload,
+                "strategy": f"{payload.get('strategy') or payload['signal_type']}{config.INTRADAY_TAG}{self.bar_sec}s",
+                "params": {**(payload.get("params") or {}), "bar_sec": self.bar_sec}}
+
+    def on_bar(self, bar: Bar):
+        closed = self.closed_at(bar)
+        # rows are labelled by bar open, like the hourly ingest (yfinance 60m / resample("1H"))
+        opened = bar.ts - self.agg.bar
+        buf = self.buffers.setdefault(bar.ticker, deque(maxlen=self.lookback))
+        if buf and opened <= buf[-1][0]:
+            return   # duplicate / out-of-order bar
+        buf.append((opened, bar.close))
+        self.bars += 1
+        if self.writer.persist_bars:
+            self.writer.put("bar", (bar.ticker, bar.close, bar.volume, opened), closed)
+
+        ts, close = zip(*buf)
+        data = pd.DataFrame({"close": np.fromiter(close, dtype=np.float64, count=len(close))},
+                            index=pd.DatetimeIndex(ts))
+        payloads, errors = signals_engine.compute_signals(bar.ticker, data)
+        self.eval_lat.append(time.time() - closed)
+        if errors:
+            print(f"[stream] {bar.ticker} errors={errors}")
+
+        for _, payload in payloads:
+            self.signals += 1
+            row = {**self._tag(payload), "triggered_by": "stream", "timestamp": opened, "bar_ts": opened}
+            self.writer.put("signal", row, closed)
+            self._maybe_alert(payload, opened)
+
+    def _maybe_alert(self, payload: Dict[str, Any], bar_ts: datetime):
+        if not (signals_engine.ENABLE_ALERTS and signals_engine.WEBHOOK_URL and payload["action"] in ("BUY", "SELL")):
+            return
+        key = (payload["ticker"], payload["signal_type"], payload["action"])
+        last = self._last_alert.get(key)
+        if last is not None and bar_ts - last < timedelta(minutes=signals_engine.ALERT_COOLDOWN_MIN):
+            return
+        self._last_alert[key] = bar_ts
+        msg = payload.get("message") or f"{payload['ticker']} {payload['signal_type']} → {payload['action']}"
+        self._alerts.submit(send_alert, msg, signals_engine.WEBHOOK_URL)
+
+    def metrics(self) -> Dict[str, Any]:
+        def pct(d):
+            if not d:
+                return {}
+            a = np.asarray(d) * 1000
+            return {"p50_ms": round(float(np.percentile(a, 50)), 2), "p95_ms": round(float(np.percentile(a, 95)), 2),
+                    "max_ms": round(float(a.max()), 2)}
+        return {
+            "tickers": len(self.buffers), "bars": self.bars, "signals": self.signals,
+            "rows_written": self.writer.rows_written, "flushes": self.writer.flushes,
+            "dropped": self.writer.dropped,
+            "late_ticks_dropped": self.agg.late_dropped,
+            "queue": self.writer.q.qsize(),
+            "bar_to_signal": pct(list(self.eval_lat)),
+            "bar_to_db": pct(list(self.writer.persist_lat)),
+        }
+
+    def run(self, feed: Iterable, report_every_sec: float = 10.0):
+        self.writer.start()
+        if self.live_clock:
+            interval = min(1.0, max(0.05, self.agg.grace.total_seconds() / 4))
+            threading.Thread(target=self._flush_timer, args=(interval,), name="stream-flush", daemon=True).start()
+        last_report = time.monotonic()
+        try:
+            for ev in feed:
+                if self.stopped.is_set():
+                    break
+                self.on_event(ev)
+                if time.monotonic() - last_report >= report_every_sec:
+                    print(f"[stream] metrics {self.metrics()}")
+                    last_report = time.monotonic()
+            with self._lock:
+                for bar in self.agg.flush_due(datetime.max.replace(tzinfo=timezone.utc)):
+                    self.on_bar(bar)
+        finally:
+            self.stopped.set()
+            self.writer.stop()
+            self.writer.join()
+            self._alerts.shutdown(wait=True)
+            print(f"[stream] stopped metrics={self.metrics()}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Streaming per-bar signal evaluation")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--source", help="pluggable feed 'module:callable' (tickers -> iterable of Bar/Tick)")
+    src.add_argument("--csv-dir", help="replay <TICKER>.csv bars (timestamp,close[,volume])")
+    src.add_argument("--synthetic", type=int, help="replay N synthetic tickers")
+    ap.add_argument("--tickers", help="comma list for --source")
+    ap.add_argument("--bars", type=int, default=600, help="bars per synthetic ticker")
+    ap.add_argument("--bar-sec", type=int, default=config.STREAM_BAR_SEC)
+    ap.add_argument("--persist-bars", action=argparse.BooleanOptionalAction, default=config.STREAM_PERSIST_BARS,
+                    help="write closed bars to prices (default: only when --bar-sec is 3600)")
+    ap.add_argument("--speedup", type=float, default=0, help="replay pace (x real time); 0 = as fast as possible")
+    ap.add_argument("--seed-from-db", action="store_true", help="prime buffers from prices (hourly bars only)")
+    args = ap.parse_args()
+
+    if args.source:
+        tickers = [t.strip() for t in (args.tickers or "").split(",") if t.strip()]
+        feed = load_source(args.source)(tickers)
+        engine = StreamEngine(bar_sec=args.bar_sec, persist_bars=args.persist_bars,
+                              closed_at=getattr(feed, "closed_at", None))
+    else:
+        frames = csv_frames(args.csv_dir) if args.csv_dir else \
+            synthetic_frames([f"SYN{i:04d}" for i in range(args.synthetic)], args.bars, args.bar_sec)
+        tickers = list(frames)
+        feed = ReplayFeed(frames, args.speedup)
+        engine = StreamEngine(bar_sec=args.bar_sec, persist_bars=args.persist_bars, closed_at=feed.closed_at)
+    if args.seed_from_db:
+        engine.seed(tickers)
+
+    def _handle(signum, _frame):
+        print(f"[stream] signal {signum} received")
+        engine.stopped.set()
+
+    signal.signal(signal.SIGTERM, _handle)
+    signal.signal(signal.SIGINT, _handle)
+    engine.run(feed)
+
+
+if __name__ == "__main__":
+    main()
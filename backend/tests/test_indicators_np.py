@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators_np
+import signals_engine
+
+
+def _frame(close) -> pd.DataFrame:
+    idx = pd.date_range("2024-01-01", periods=len(close), freq="h", tz="UTC")
+    return pd.DataFrame({"close": np.asarray(close, dtype=np.float64)}, index=idx)
+
+
+def _walk(n: int, base: float, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return _frame(base * np.exp(np.cumsum(rng.normal(0, 0.01, n))))
+
+
+SERIES = {
+    "walk_400_penny": lambda: _walk(400, 1.0),
+    "walk_400_stock": lambda: _walk(400, 150.0),
+    "walk_400_crypto": lambda: _walk(400, 60000.0),
+    "walk_250_past_longest_window": lambda: _walk(250, 150.0, seed=3),
+    "short_below_every_window": lambda: _walk(10, 150.0, seed=11),
+    "short_between_windows": lambda: _walk(30, 150.0, seed=12),
+    "single_bar": lambda: _frame([101.5]),
+    "flat": lambda: _frame(np.full(300, 42.0)),
+    "flat_then_step": lambda: _frame(np.r_[np.full(150, 42.0), np.full(150, 43.0)]),
+    "leading_nans": lambda: _frame(np.r_[np.full(5, np.nan), _walk(300, 150.0, seed=5)["close"].to_numpy()]),
+}
+
+# name -> (pandas outputs, numpy outputs) for one frame
+CALCS = {
+    "macd": lambda df: (signals_engine.calculate_macd(df), indicators_np.calculate_macd(df)),
+    "bollinger": lambda df: (signals_engine.calculate_bollinger(df), indicators_np.calculate_bollinger(df)),
+    "ma_cross": lambda df: (signals_engine.calculate_ma_cross(df), indicators_np.calculate_ma_cross(df)),
+    "rsi": lambda df: ((signals_engine.calculate_rsi(df["close"]),), (indicators_np.calculate_rsi(df["close"]),)),
+    "breakout": lambda df: (signals_engine.calculate_close_breakout(df), indicators_np.calculate_close_breakout(df)),
+}
+
+
+@pytest.mark.parametrize("calc", list(CALCS))
+@pytest.mark.parametrize("series", list(SERIES))
+def test_matches_pandas_backend(series, calc):
+    df = SERIES[series]()
+    scale = float(np.nanmax(np.abs(df["close"].to_numpy())))
+    ref, got = CALCS[calc](df)
+    assert len(ref) == len(got)
+    for i, (a, b) in enumerate(zip(ref, got)):
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        assert a.shape == b.shape, f"output {i}"
+        np.testing.assert_allclose(b, a, rtol=1e-9, atol=1e-9 * scale, equal_nan=True, err_msg=f"output {i}")
+
+
+def test_cases_cover_every_calculate_function():
+    public = {n for n in dir(signals_engine) if n.startswith("calculate_")}
+    assert public <= {n for n in dir(indicators_np) if n.startswith("calculate_")}
+    assert len(CALCS) == len(public)
+
+
+def test_set_indicator_backend_rejects_unknown():
+    with pytest.raises(ValueError):
+        signals_engine.set_indicator_backend("foo")
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import streaming
+from streaming import Bar, BatchWriter, Tick, TickAggregator
+
+T0 = datetime(2024, 1, 2, 15, 0, tzinfo=timezone.utc)
+
+
+def _tick(sec: float, price: float, size: int = 1, ticker: str = "AAPL") -> Tick:
+    return Tick(ticker, T0 + timedelta(seconds=sec), price, size)
+
+
+# ====== TickAggregator ======
+def test_bar_closes_only_after_grace():
+    agg = TickAggregator(bar_sec=60, grace_sec=2)
+    assert agg.add(_tick(10, 100.0)) == []
+    assert agg.add(_tick(59, 101.0)) == []
+    assert agg.add(_tick(61, 102.0)) == []          # past the bar end, still inside grace
+    bars = agg.add(_tick(62, 103.0))
+    assert bars == [Bar("AAPL", T0 + timedelta(seconds=60), 101.0, 2)]
+
+
+def test_tick_inside_grace_lands_in_its_own_bar():
+    agg = TickAggregator(bar_sec=60, grace_sec=2)
+    agg.add(_tick(10, 100.0))
+    agg.add(_tick(61, 102.0))
+    agg.add(_tick(59, 101.0, size=5))               # late, but the 15:01 bar is still open
+    bars = agg.add(_tick(63, 104.0))
+    assert bars == [Bar("AAPL", T0 + timedelta(seconds=60), 101.0, 6)]
+    assert agg.late_dropped == 0
+
+
+def test_close_is_last_tick_by_event_time():
+    agg = TickAggregator(bar_sec=60, grace_sec=2)
+    agg.add(_tick(50, 101.0))
+    agg.add(_tick(20, 99.0))                        # arrives after, happened before
+    bars = agg.flush_due(T0 + timedelta(seconds=62))
+    assert [(b.close, b.volume) for b in bars] == [(101.0, 2)]
+
+
+def test_tick_for_emitted_bar_is_dropped():
+    agg = TickAggregator(bar_sec=60, grace_sec=2)
+    agg.add(_tick(10, 100.0))
+    assert len(agg.add(_tick(70, 105.0))) == 1
+    assert agg.add(_tick(30, 99.0)) == []
+    assert agg.late_dropped == 1
+    # the later, still-open bar is untouched
+    bars = agg.flush_due(T0 + timedelta(seconds=122))
+    assert bars == [Bar("AAPL", T0 + timedelta(seconds=120), 105.0, 1)]
+
+
+def test_flush_due_uses_now_as_clock():
+    agg = TickAggregator(bar_sec=60, grace_sec=2)
+    assert agg.flush_due(T0) == []                  # nothing open yet
+    agg.add(_tick(10, 100.0))
+    agg.add(_tick(15, 100.5, ticker="MSFT"))
+    assert agg.flush_due(T0 + timedelta(seconds=61)) == []
+    bars = agg.flush_due(T0 + timedelta(seconds=62))
+    assert sorted(b.ticker for b in bars) == ["AAPL", "MSFT"]
+    # an earlier `now` never moves the clock back
+    agg.add(_tick(70, 101.0))
+    assert agg.flush_due(T0) == []
+    assert agg.flush_due(T0 + timedelta(seconds=122))[0].close == 101.0
+
+
+# ====== BatchWriter ======
+class _FakeConn:
+    def __init__(self):
+        self.closed = False
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    c = _FakeConn()
+    monkeypatch.setattr(streaming.db_query, "connect", lambda: c)
+    return c
+
+
+def _drain(writer: BatchWriter):
+    writer.stop()
+    writer.run()   # synchronously: drains the queue, then returns
+
+
+def _fill(writer: BatchWriter, closed: float):
+    writer.put("bar", ("AAPL", 101.0, 2, T0), closed)
+    writer.put("signal", {"ticker": "AAPL"}, closed)
+    writer.put("signal", {"ticker": "AAPL"}, closed)
+
+
+def test_batch_writer_counts_committed_rows(monkeypatch, conn):
+    bars_written = []
+    monkeypatch.setattr(streaming, "insert_prices_batch", lambda rows, conn, cursor: bars_written.extend(rows))
+    monkeypatch.setattr(streaming, "insert_signals_batch", lambda rows, conn, cursor: len(rows))
+    w = BatchWriter(persist_bars=False, flush_ms=10, flush_rows=100)
+    _fill(w, closed=0.0)
+    _drain(w)
+    assert (w.flushes, w.rows_written, w.dropped) == (1, 2, 0)
+    assert len(w.persist_lat) == 2                   # one sample per signal row
+    assert bars_written == []                        # persist_bars off
+    assert conn.commits == 1 and conn.closed
+
+
+def test_batch_writer_persists_bars_when_enabled(monkeypatch, conn):
+    bars_written = []
+    monkeypatch.setattr(streaming, "insert_prices_batch", lambda rows, conn, cursor: bars_written.extend(rows))
+    monkeypatch.setattr(streaming, "insert_signals_batch", lambda rows, conn, cursor: len(rows))
+    w = BatchWriter(persist_bars=True, flush_ms=10, flush_rows=100)
+    _fill(w, closed=0.0)
+    _drain(w)
+    assert bars_written == [("AAPL", 101.0, 2, T0)]
+
+
+def test_batch_writer_failed_flush_rolls_back_and_counts_dropped(monkeypatch, conn):
+    def boom(rows, conn, cursor):
+        raise RuntimeError("db down")
+    monkeypatch.setattr(streaming, "insert_prices_batch", boom)
+    monkeypatch.setattr(streaming, "insert_signals_batch", boom)
+    w = BatchWriter(persist_bars=True, flush_ms=10, flush_rows=100)
+    _fill(w, closed=0.0)
+    _drain(w)
+    assert (w.flushes, w.rows_written, w.dropped) == (0, 0, 3)
+    assert len(w.persist_lat) == 0
+    assert conn.rollbacks == 1 and conn.commits == 0 and conn.closed